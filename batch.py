@@ -0,0 +1,377 @@
+"""
+Transduction of many HTML files, optionally spread over a pool of processes.
+"""
+
+import gettext
+import hashlib
+import importlib
+import json
+import os
+import sys
+from itertools import islice
+
+import config
+import patterns
+import profiles
+import transducer
+from cache import TransductionCache
+
+_ = gettext.translation(config.domain, localedir=config.localedir, fallback=True).gettext
+
+extensions = ('.html', '.htm')
+
+# The modules whose source files are part of the version in `stamp`
+_engine = ['batch', 'indexmap', 'patterns', 'reparse', 'tokenizer', 'transducer']
+
+# The version of the format of the manifest files
+manifest_format = 1
+
+
+def collect(paths, output_dir=None):
+    """
+    Lists the files to be transduced.
+
+    :param paths: a list of paths of files and directories. A directory stands for the files with one of the
+        `extensions` in its tree.
+    :param output_dir: the directory to write the output files to, or `None` to overwrite the input files.
+        The files found in a directory keep their path relative to the directory.
+    :return: a generator of pairs `(source, destination)`
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(extensions):
+                        source = os.path.join(root, name)
+                        yield source, _destination(source, os.path.relpath(source, path), output_dir)
+        else:
+            yield path, _destination(path, os.path.basename(path), output_dir)
+
+
+def _destination(source, relative, output_dir):
+    if output_dir is None:
+        return source
+    return os.path.join(output_dir, relative)
+
+
+def capture(master, modules):
+    """
+    Captures the configuration of a `MasterTransducer` so that it can be restored in another process.
+
+    :param master: the configured `MasterTransducer`
+    :param modules: the names of the modules and the paths of the pattern files that register the transducers,
+        for example ``['cs', 'en']``, see `patterns.register`
+    :return: a picklable tuple
+    """
+    selected = tuple(transducer.name for transducer in master.selected)
+    cache_size = None if master.cache is None else master.cache.maxsize
+    backend = master.backend.value
+    nbsp = master.nbsp.name
+    return (tuple(modules), selected, master.fused, master.statistics is not None, cache_size, backend, nbsp,
+            master.profile_cache)
+
+
+def configure(configuration):
+    """
+    Configures `transducer.master` in this process, unless it is configured that way already.
+    If the configuration names a directory of profiles, the analyses of the selected transducers are loaded from it
+    (see `profiles.load`) rather than repeated.
+
+    :param configuration: a tuple returned by `capture`
+    """
+    if capture(transducer.master, configuration[0]) == configuration:
+        return
+    modules, selected, fused, statistics, cache_size, backend, nbsp, profile_cache = configuration
+    for module in modules:
+        patterns.register(module)
+    transducer.master.select(selected, fused)
+    transducer.master.collect_statistics(statistics)
+    transducer.master.backend = transducer.ReTransducer.Backend(backend)
+    transducer.master.nbsp = transducer.Transducer.Nbsp[nbsp]
+    transducer.master.profile_cache = profile_cache
+    if profile_cache is not None:
+        profiles.load(profile_cache, transducer.master, modules)
+    # Every process has its own cache in memory. The keys of the cache identify the transducers, so the cache is kept
+    # when only the selection changes.
+    cache = transducer.master.cache
+    if cache_size is None:
+        transducer.master.cache = None
+    elif cache is None or cache.maxsize != cache_size:
+        transducer.master.cache = TransductionCache(cache_size)
+
+
+def process(configuration, source, destination, encoding='utf_8', chunk_size=None, stamp=None, previous=None):
+    """
+    Transduces a file. The destination is replaced only after the transduction has succeeded.
+
+    :param configuration: a tuple returned by `capture`, or `None` to use `transducer.master` as it is
+    :param source: the path of the input file
+    :param destination: the path of the output file, possibly the same as `source`
+    :param encoding: the encoding of both files
+    :param chunk_size: the chunk size for `Transducer.process_file`
+    :param stamp: the stamp of the configuration as returned by `stamp`, or `None` to keep no manifest
+    :param previous: the manifest entry of the file from an earlier run, or `None`
+    :return: a triple of the error message (or `None` on success), the statistics taken by
+        `MasterTransducer.take_statistics` if they are collected and `configuration` is set (or `None`)
+        and the manifest entry of the file if `stamp` is set (or `None`)
+    """
+    entry = None
+    try:
+        if configuration is not None:
+            configure(configuration)
+        if stamp is not None:
+            input_digest = digest(source)
+            if previous is not None and _unchanged(previous, stamp, source, destination, input_digest):
+                return None, None, previous
+        directory = os.path.dirname(destination)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = '{0}.{1}.tmp'.format(destination, os.getpid())
+        try:
+            with open(source, encoding=encoding) as infile, open(temporary, 'w', encoding=encoding) as outfile:
+                transducer.master.process_file(infile, outfile, chunk_size)
+            os.replace(temporary, destination)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        if stamp is not None:
+            entry = {'destination': destination, 'input': input_digest, 'output': digest(destination), 'stamp': stamp}
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    else:
+        error = None
+    statistics = None
+    if configuration is not None and transducer.master.statistics is not None:
+        statistics = transducer.master.take_statistics()
+    return error, statistics, entry
+
+
+def _unchanged(previous, stamp, source, destination, input_digest):
+    """
+    Tells whether the output of an earlier run is still valid.
+    """
+    if previous['stamp'] != stamp or previous['destination'] != destination:
+        return False
+    if input_digest != previous['input'] and not (source == destination and input_digest == previous['output']):
+        return False
+    return os.path.exists(destination) and digest(destination) == previous['output']
+
+
+def digest(path):
+    """
+    :return: the SHA-256 digest of the content of a file
+    """
+    result = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            result.update(chunk)
+    return result.hexdigest()
+
+
+def stamp(master, modules):
+    """
+    Identifies the configuration of a `MasterTransducer` together with the version of the code that transduces,
+    so that changing either invalidates the manifest entries.
+
+    :param master: the configured `MasterTransducer`
+    :param modules: the names of the language modules and the paths of the pattern files, see `patterns.register`
+    :return: a hexadecimal digest
+    """
+    result = hashlib.sha256(master.fingerprint().encode('ascii'))
+    result.update(version(modules).encode('ascii'))
+    return result.hexdigest()
+
+
+def version(modules):
+    """
+    Identifies the version of the code that transduces: a digest of the source files of nbspacer, of the language
+    modules and of the pattern files.
+
+    :param modules: the names of the language modules and the paths of the pattern files, see `patterns.register`
+    :return: a hexadecimal digest
+    """
+    result = hashlib.sha256()
+    for name in sorted(set(_engine) | set(modules)):
+        path = name if name.endswith(patterns.extension) else importlib.import_module(name).__file__
+        with open(path, 'rb') as f:
+            result.update(f.read())
+    return result.hexdigest()
+
+
+def load_manifest(path):
+    """
+    Loads a manifest written by `save_manifest`.
+
+    :return: a dictionary that maps the paths of the input files to their entries,
+        empty if the file does not exist or has another format
+    """
+    try:
+        with open(path, encoding='utf_8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if manifest.get('format') != manifest_format:
+        return {}
+    return manifest['files']
+
+
+def save_manifest(path, files):
+    """
+    Saves a manifest, replacing the file only after it has been written completely.
+
+    :param path: the path of the manifest file
+    :param files: a dictionary that maps the paths of the input files to their entries
+    """
+    temporary = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(temporary, 'w', encoding='utf_8') as f:
+        json.dump({'format': manifest_format, 'files': files}, f, indent=1, sort_keys=True)
+    os.replace(temporary, path)
+
+
+def run(configuration, pairs, jobs=1, encoding='utf_8', chunk_size=None, file=sys.stderr, manifest=None):
+    """
+    Transduces files. A file that cannot be transduced is reported and skipped.
+    With a manifest, a file is skipped if neither the file, its output nor the configuration has changed since
+    the run that recorded it.
+
+    :param configuration: a tuple returned by `capture`
+    :param pairs: an iterable of pairs `(source, destination)` as returned by `collect`
+    :param jobs: the number of worker processes. With 1, the files are transduced in this process
+        by `transducer.master` as it is configured.
+    :param encoding: the encoding of the files
+    :param chunk_size: the chunk size for `Transducer.process_file`
+    :param file: the file to report the errors to
+    :param manifest: a dictionary returned by `load_manifest` to update, or `None`
+    :return: the number of files that could not be transduced
+    """
+    failed = 0
+    modules = configuration[0]
+    current = None if manifest is None else stamp(transducer.master, modules)
+
+    def report(source, result):
+        nonlocal failed
+        error, statistics, entry = result
+        if statistics is not None:
+            transducer.master.merge_statistics(statistics)
+        if manifest is not None:
+            if entry is None:
+                manifest.pop(source, None)
+            else:
+                manifest[source] = entry
+        if error is not None:
+            failed += 1
+            file.write(_('{0}: error: {1}\n').format(source, error))
+
+    def tasks(worker_configuration):
+        for source, destination in pairs:
+            previous = None if manifest is None else manifest.get(source)
+            yield source, (worker_configuration, source, destination, encoding, chunk_size, current, previous)
+
+    _map(process, configuration, tasks, jobs, report)
+    return failed
+
+
+def check(configuration, source, encoding='utf_8', chunk_size=None, every=False):
+    """
+    Finds the changes that the transduction would make to a file, see `Transducer.check_file`.
+
+    :param configuration: a tuple returned by `capture`, or `None` to use `transducer.master` as it is
+    :param source: the path of the file
+    :param encoding: the encoding of the file
+    :param chunk_size: the chunk size for `Transducer.check_file`
+    :param every: whether to find every change rather than only the first one
+    :return: a pair of the error message (or `None` on success) and the list of the changes
+    """
+    changes = []
+    try:
+        if configuration is not None:
+            configure(configuration)
+        with open(source, encoding=encoding) as infile:
+            found = transducer.master.check_file(infile, chunk_size)
+            changes = list(found if every else islice(found, 1))
+    except Exception as e:
+        return str(e) or type(e).__name__, changes
+    return None, changes
+
+
+def run_check(configuration, sources, jobs=1, encoding='utf_8', chunk_size=None, every=False, file=sys.stdout,
+              errors=sys.stderr):
+    """
+    Checks files without writing anything. Every file the transduction would change is reported with the location of
+    its first change, or of every change.
+
+    :param configuration: a tuple returned by `capture`
+    :param sources: an iterable of the paths of the files
+    :param jobs: the number of worker processes, see `run`
+    :param encoding: the encoding of the files
+    :param chunk_size: the chunk size for `Transducer.check_file`
+    :param every: whether to report every change rather than only the first one
+    :param file: the file to report the changes to
+    :param errors: the file to report the errors to
+    :return: the number of files that would change or could not be checked
+    """
+    failed = 0
+
+    def report(source, result):
+        nonlocal failed
+        error, changes = result
+        if error is not None:
+            errors.write(_('{0}: error: {1}\n').format(source, error))
+        for change in changes:
+            file.write(format_change(source, change, every))
+        if error is not None or changes:
+            failed += 1
+
+    def tasks(worker_configuration):
+        for source in sources:
+            yield source, (worker_configuration, source, encoding, chunk_size, every)
+
+    _map(check, configuration, tasks, jobs, report)
+    return failed
+
+
+def format_change(source, change, text=False):
+    """
+    Formats a change found by `Transducer.check_file` as a line of a report.
+
+    :param source: the name of the file
+    :param change: a quadruple `(line, column, text, name)`
+    :param text: whether to show the text that would change
+    :return: the line, for example ``page.html:2:5: cs.ksvz`` or ``page.html:2:5: cs.ksvz: ' '``
+    """
+    line, column, changed, name = change
+    if text:
+        return _('{0}:{1}:{2}: {3}: {4!r}\n').format(source, line, column, name, changed)
+    return _('{0}:{1}:{2}: {3}\n').format(source, line, column, name)
+
+
+def _map(function, configuration, tasks, jobs, report):
+    """
+    Calls a function for every task, in worker processes unless `jobs` is 1, and reports the results in this process.
+
+    :param function: a function whose first argument is a configuration returned by `capture` or `None`
+    :param configuration: a tuple returned by `capture`
+    :param tasks: a function that takes the configuration to pass to `function` and returns an iterable of pairs of
+        the name of a task and the tuple of the arguments of `function`
+    :param jobs: the number of worker processes. With 1, the function is called in this process with `None`
+        as the configuration, so that it uses `transducer.master` as it is configured.
+    :param report: a function called with the name and the result of every task
+    """
+    if jobs == 1:
+        for name, arguments in tasks(None):
+            report(name, function(*arguments))
+        return
+    # Importing the process pool takes about as long as the rest of the start, so it is only imported when needed.
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    with ProcessPoolExecutor(jobs) as executor:
+        # The number of submitted tasks is bounded so that the tasks are listed lazily.
+        pending = {}
+        for name, arguments in tasks(configuration):
+            if len(pending) >= 2 * jobs:
+                done, _not_done = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    report(pending.pop(future), future.result())
+            pending[executor.submit(function, *arguments)] = name
+        for future, name in pending.items():
+            report(name, future.result())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+"""
+Measures the running time of :py:mod:`nbspacer` on scaled corpora.
+
+Two corpora are built from the test data:
+
+* *tag-dense*: copies of ``test/prirucka-nonbsp.html``, a real web page with many tags
+* *text-dense*: the inputs of ``test_masterTransducer_cs.json``, one per line, without tags
+
+Every corpus is scaled to the requested sizes. For every corpus and size, the script times
+`Transducer.transduce_html` and `MasterTransducer.substitute` of the selected transducers,
+and `Transducer.substitute` of every registered transducer on its own.
+With ``--jobs``, `Transducer.transduce_html` is also timed with the content split into shards transduced by
+a `shards.ShardPool`, and its speedup over the sequential run is reported.
+The results are written as JSON so that runs on different machines or revisions can be compared.
+
+Example: ``python3 benchmarks/benchmark.py --sizes 1000 1000000 --output results.json``
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from argparse import Namespace
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import cs  # noqa: E402
+import en  # noqa: E402
+import shards  # noqa: E402
+import tokenizer  # noqa: E402
+import transducer  # noqa: E402
+from indexmap import IndexMap  # noqa: E402
+
+assert cs
+assert en
+
+
+def corpora():
+    """
+    :return: a dictionary of the base documents of the corpora
+    """
+    with open(os.path.join(root, 'test', 'prirucka-nonbsp.html'), encoding='utf_8') as f:
+        tag_dense = f.read()
+    with open(os.path.join(root, 'test_masterTransducer_cs.json'), encoding='utf_8') as f:
+        text_dense = ''.join(case[0] + '\n' for case in json.load(f))
+    return {'tag-dense': tag_dense, 'text-dense': text_dense}
+
+
+def scale(document, size):
+    """
+    Repeats a document and truncates the result to a given number of characters.
+    The document is truncated after a newline, so that no tag is cut.
+    """
+    result = document * (size // len(document) + 1)
+    end = result.rfind('\n', 0, size) + 1
+    return result[:end or size]
+
+
+def measure(function, repeat):
+    """
+    :return: the shortest of `repeat` running times of `function` in seconds
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=root, stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat, groups, fused, each, backend='auto', jobs=1, file=sys.stderr):
+    """
+    Runs the benchmarks.
+
+    :return: a list of results. Every result is a dictionary with the keys ``corpus``, ``size``, ``target``
+        and ``seconds``. The result of the sharded transduction also has the key ``speedup``.
+    """
+    master = transducer.master
+    master.configure(Namespace(help=False, group=[groups] if groups else None, transducer=None, fused=fused,
+                               backend=backend))
+    pool = shards.ShardPool(master, ['cs', 'en'], jobs) if jobs > 1 else None
+    results = []
+    for corpus, document in sorted(corpora().items()):
+        for size in sizes:
+            html = scale(document, size)
+            content, _tags = tokenizer.tokenize(html)
+            targets = [('transduce_html', lambda: master.transduce_html(html)),
+                       ('substitute', lambda: master.substitute(content, IndexMap.identity(len(content))))]
+            if each:
+                for t in master.transducers.values():
+                    targets.append((t.name, lambda t=t: t.substitute(content, IndexMap.identity(len(content)))))
+            for target, function in targets:
+                seconds = measure(function, repeat)
+                results.append({'corpus': corpus, 'size': len(html), 'target': target, 'seconds': seconds})
+                file.write('{0:>10} {1:>10} {2:<40} {3:.6f}\n'.format(corpus, len(html), target, seconds))
+            if jobs > 1:
+                sequential = results[-len(targets)]['seconds']
+                master.shard_pool = pool
+                try:
+                    seconds = measure(lambda: master.transduce_html(html), repeat)
+                finally:
+                    master.shard_pool = None
+                target = 'transduce_html ({0} jobs)'.format(jobs)
+                results.append({'corpus': corpus, 'size': len(html), 'target': target, 'seconds': seconds,
+                                'speedup': sequential / seconds})
+                file.write('{0:>10} {1:>10} {2:<40} {3:.6f} ({4:.2f}x)\n'.format(corpus, len(html), target, seconds,
+                                                                                sequential / seconds))
+    if pool is not None:
+        pool.close()
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Measures the running time of nbspacer on scaled corpora.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000], metavar='N',
+                        help='corpus sizes in characters (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs per measurement (default: %(default)s)')
+    parser.add_argument('--group', '-g', nargs='+', metavar='G',
+                        help='transducer groups to select (default: all the transducers)')
+    parser.add_argument('--fused', action='store_true', help='merge the independent transducers')
+    parser.add_argument('--backend', choices=[b.value for b in transducer.ReTransducer.Backend], default='auto',
+                        help='how the matches of the patterns are found (default: %(default)s)')
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help='also time the transduction of shards by N processes (default: %(default)s)')
+    parser.add_argument('--no-each', dest='each', action='store_false',
+                        help='do not time the transducers one by one')
+    parser.add_argument('--output', '-o', metavar='FILE', help='JSON output file (default: standard output)')
+    namespace = parser.parse_args(args)
+
+    results = run(namespace.sizes, namespace.repeat, namespace.group, namespace.fused, namespace.each,
+                  namespace.backend, namespace.jobs)
+    report = {
+        'revision': revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'groups': namespace.group,
+        'fused': namespace.fused,
+        'backend': namespace.backend,
+        'jobs': namespace.jobs,
+        'repeat': namespace.repeat,
+        'results': results,
+    }
+    if namespace.output:
+        with open(namespace.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+This module defines `TransductionCache`, a cache of transduced blocks of HTML documents.
+`MasterTransducer.transduce_html` uses the cache to avoid transducing the blocks that repeat across documents,
+such as navigation or footers.
+"""
+
+import dbm
+import hashlib
+from collections import OrderedDict
+
+
+class TransductionCache:
+    """
+    A bounded least recently used cache that maps blocks of HTML to their transduced versions,
+    optionally backed by a persistent store on disk.
+
+    The keys are hashes of the blocks together with a fingerprint of the transducers, so the cache may be shared by
+    runs with different configurations.
+    """
+
+    def __init__(self, maxsize=4096, path=None):
+        """
+        :param maxsize: the maximum number of blocks kept in memory
+        :param path: the path of a :py:mod:`dbm` database to store the blocks in, or `None` to keep them only in memory
+        """
+        assert maxsize > 0
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.store = None if path is None else dbm.open(path, 'c')
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(fingerprint, block):
+        """
+        :param fingerprint: a string that identifies the configuration of the transducers
+        :param block: a block of HTML
+        :return: the key of the block
+        """
+        digest = hashlib.sha256(fingerprint.encode('ascii'))
+        digest.update(block.encode('utf_8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        :return: the cached value, or `None` if there is none
+        """
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+        if self.store is not None:
+            stored = self.store.get(key)
+            if stored is not None:
+                value = stored.decode('utf_8', 'surrogatepass')
+                self._remember(key, value)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.store is not None:
+            self.store[key] = value.encode('utf_8', 'surrogatepass')
+
+    def _remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def close(self):
+        """
+        Closes the store on disk.
+        """
+        if self.store is not None:
+            self.store.close()
+            self.store = None
@@ -143,7 +143,7 @@ master.add(DottedNbspSubstituter(['n', 'l'], 'cs.acronym.nl',
                                  examples=['2016 n. l.']),
            [lang_cs, prirucka, abbreviation, acronym])
 
-master.add(ReTransducer(r'\bČSN( )\d{2}( |&nbsp;)\d{4}\b', {1: r'&nbsp;', 2: r'&nbsp;'}, name='cs.csn',
+master.add(ReTransducer(r'\bČSN( )\d{2}( |&nbsp;|\xa0)\d{4}\b', {1: r'&nbsp;', 2: r'&nbsp;'}, name='cs.csn',
                         examples=['ČSN 01 6910']),
            [lang_cs, prirucka, abbreviation, acronym])
 
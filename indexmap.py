@@ -0,0 +1,228 @@
+"""
+This module defines `IndexMap`, the map from the positions of a transduced string to the positions of the original
+string. `Transducer.transduce_html` uses the map to insert the HTML tags back into the transduced content.
+"""
+
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+
+class IndexMap:
+    """
+    A non-decreasing map from the positions of a transduced string to the indices of the original string.
+
+    The map is stored as a sequence of runs, so its size is proportional to the number of replacements rather than
+    to the length of the string.
+    The run `r` spans `lengths[r]` consecutive positions.
+    If `steps[r]` is 1, the run maps its positions to consecutive indices starting at `origins[r]` (the run was copied
+    from the original string). If `steps[r]` is 0, the run maps all its positions to `origins[r]` (the run is
+    a replacement).
+    Storing the lengths rather than the starts of the runs lets `replace` copy the unaffected runs in bulk.
+
+    The map is not modified after it has been constructed.
+    """
+
+    def __init__(self):
+        self.length = 0
+        self.lengths = array('q')
+        self.origins = array('q')
+        self.steps = array('b')
+        self._ends = None
+
+    @classmethod
+    def identity(cls, length):
+        """
+        Constructs the map of a string that has not been transduced.
+
+        :param length: the length of the string
+        """
+        index_map = cls()
+        index_map._append(length, 0, 1)
+        return index_map
+
+    @classmethod
+    def from_sequence(cls, indices):
+        """
+        Constructs the map that maps the positions of a string to the given indices.
+
+        :param indices: a non-decreasing iterable of integers, for example a list or a `range`
+        """
+        if isinstance(indices, range) and indices.step == 1:
+            index_map = cls()
+            index_map._append(len(indices), indices.start, 1)
+            return index_map
+        index_map = cls()
+        for index in indices:
+            if index_map.lengths:
+                last = index_map.origins[-1] + (index_map.lengths[-1] - 1) * index_map.steps[-1]
+                assert index >= last
+                if index == last:
+                    if index_map.steps[-1] and index_map.lengths[-1] > 1:
+                        # Split off the last position to start a run of a replacement.
+                        index_map.lengths[-1] -= 1
+                        index_map.length -= 1
+                        index_map._append(1, index, 0)
+                    index_map.steps[-1] = 0
+                    index_map._append(1, index, 0)
+                    continue
+            index_map._append(1, index, 1)
+        return index_map
+
+    @classmethod
+    def of(cls, indices):
+        """
+        Converts the indices of a string to an `IndexMap`.
+
+        :param indices: an `IndexMap` or a non-decreasing sequence of integers
+        :return: `indices` if it is an `IndexMap`, otherwise the map constructed by `from_sequence`
+        """
+        if isinstance(indices, cls):
+            return indices
+        return cls.from_sequence(indices)
+
+    @classmethod
+    def concatenate(cls, maps, offsets):
+        """
+        Constructs the map of a concatenation of transduced strings.
+
+        :param maps: the maps of the transduced strings
+        :param offsets: the indices of the original strings in the concatenation of the original strings
+        """
+        index_map = cls()
+        for other, offset in zip(maps, offsets):
+            for length, origin, step in other.runs():
+                index_map._append(length, origin + offset, step)
+        return index_map
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.length:
+            raise IndexError(position)
+        return self._value(self.ends(), position)
+
+    def __iter__(self):
+        for length, origin, step in self.runs():
+            if step:
+                yield from range(origin, origin + length)
+            else:
+                yield from (origin for _ in range(length))
+
+    def __eq__(self, other):
+        return isinstance(other, IndexMap) and list(self.runs()) == list(other.runs())
+
+    def __repr__(self):
+        return 'IndexMap({0})'.format(list(self.runs()))
+
+    def is_identity(self):
+        """
+        Tells whether this map is the map of a string that has not been transduced.
+        """
+        return not self.lengths or (len(self.lengths) == 1 and self.origins[0] == 0 and self.steps[0] == 1)
+
+    def runs(self):
+        """
+        Yields the runs of this map as triples `(length, origin, step)`.
+        """
+        return zip(self.lengths, self.origins, self.steps)
+
+    def ends(self):
+        """
+        :return: the list of the end positions of the runs
+        """
+        if self._ends is None:
+            self._ends = list(accumulate(self.lengths))
+        return self._ends
+
+    def _value(self, ends, position):
+        r = bisect_right(ends, position)
+        return self.origins[r] + (position - ends[r] + self.lengths[r]) * self.steps[r]
+
+    def _append(self, length, origin, step):
+        if length <= 0:
+            return
+        self.length += length
+        if self.lengths:
+            last_step = self.steps[-1]
+            if last_step == step and self.origins[-1] + self.lengths[-1] * step == origin:
+                # The new run continues the last one.
+                self.lengths[-1] += length
+                return
+        self.lengths.append(length)
+        self.origins.append(origin)
+        self.steps.append(step)
+
+    def _extend(self, other, start, stop):
+        """
+        Appends the runs `start` to `stop` (exclusive) of another map.
+        """
+        if start >= stop:
+            return
+        self._append(other.lengths[start], other.origins[start], other.steps[start])
+        lengths = other.lengths[start + 1:stop]
+        self.length += sum(lengths)
+        self.lengths.extend(lengths)
+        self.origins.extend(other.origins[start + 1:stop])
+        self.steps.extend(other.steps[start + 1:stop])
+
+    def _copy(self, result, ends, lo, hi):
+        """
+        Appends the span `(lo, hi)` of this map to `result`.
+        """
+        if lo >= hi:
+            return
+        first = bisect_right(ends, lo)
+        last = bisect_right(ends, hi - 1)
+        if first == last:
+            result._append(hi - lo, self._value(ends, lo), self.steps[first])
+            return
+        result._append(ends[first] - lo, self._value(ends, lo), self.steps[first])
+        result._extend(self, first + 1, last)
+        result._append(hi - ends[last] + self.lengths[last], self.origins[last], self.steps[last])
+
+    def replace(self, replacements):
+        """
+        Computes the map of a string obtained by replacing spans of the string this map belongs to.
+        This amounts to composing this map with the map of the replacements. The runs between the replacements are
+        copied in bulk.
+
+        :param replacements: a sorted list of non-overlapping replacements. Every replacement is a quadruple
+            `(start, end, length, pretend)` that denotes that the span `(start, end)` was replaced by a string of the
+            given length whose characters pretend to have the same index as the character at the position `pretend`.
+        :return: the map of the string after the replacements
+        """
+        ends = self.ends()
+        result = IndexMap()
+        pos = 0
+        for start, end, length, pretend in replacements:
+            self._copy(result, ends, pos, start)
+            if length > 0:
+                result._append(length, self._value(ends, pretend), 0)
+            pos = end
+        self._copy(result, ends, pos, self.length)
+        return result
+
+    def positions(self, indices):
+        """
+        Finds where the given indices of the original string fall in the transduced string.
+        The position of the index `i` is the position of the first character whose index is not smaller than `i`,
+        so an HTML tag that preceded the character `i` of the original string precedes the replacement of that
+        character.
+
+        :param indices: a non-decreasing iterable of indices of the original string
+        :return: a generator of the corresponding positions of the transduced string
+        """
+        runs = self.runs()
+        start = 0
+        length, origin, step = next(runs, (0, 0, 0))
+        for index in indices:
+            # Skip the runs whose last index is smaller than `index`.
+            while length and origin + (length - 1) * step < index:
+                start += length
+                length, origin, step = next(runs, (0, 0, 0))
+            if step:
+                yield start + max(0, index - origin)
+            else:
+                yield start
@@ -0,0 +1,121 @@
+"""
+Measurement and limitation of the memory used by the transduction.
+"""
+
+import gettext
+import sys
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import config
+
+_ = gettext.translation(config.domain, localedir=config.localedir, fallback=True).gettext
+
+#: a conservative estimate of the peak memory allocated to transduce a document that is read as a whole, including the
+#: document itself, in bytes per character of the document. `MemoryReport` measures 11 to 16 bytes per character on
+#: copies of ``test/prirucka-nonbsp.html`` without the document.
+bytes_per_char = 24
+
+#: the smallest chunk size chosen by `chunk_size`
+min_chunk_size = 4096
+
+
+class MemoryReport:
+    """
+    Records the peak memory allocated by the phases of the transduction using :py:mod:`tracemalloc`.
+    Tracing slows the transduction down considerably, so it should only be enabled when the report is wanted.
+    """
+
+    def __init__(self):
+        #: an ordered dictionary that maps the names of the phases to the largest increase of the allocated memory
+        #: during a phase in bytes
+        self.peaks = OrderedDict()
+        #: the peak memory allocated while a phase ran in bytes
+        self.peak = 0
+
+    def start(self):
+        """
+        Starts tracing the allocations.
+        """
+        tracemalloc.start()
+
+    def stop(self):
+        """
+        Stops tracing the allocations.
+        """
+        tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Records the peak memory allocated in a block of code.
+        The phases must not be nested.
+
+        :param name: the name of the phase
+        """
+        if not tracemalloc.is_tracing():
+            yield
+            return
+        start, _peak = tracemalloc.get_traced_memory()
+        # Before Python 3.9, the peak cannot be reset, so the peak of a phase includes the peaks of the phases
+        # before it.
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            _current, peak = tracemalloc.get_traced_memory()
+            self.peaks[name] = max(self.peaks.get(name, 0), peak - start)
+            self.peak = max(self.peak, peak)
+
+    def print_report(self, file=sys.stderr):
+        """
+        Prints the peaks in MiB into a file.
+        """
+        header = _('{0:<40} {1:>12}\n')
+        row = '{0:<40} {1:>12.2f}\n'
+        file.write(header.format(_('Phase'), _('Peak [MiB]')))
+        for name, peak in self.peaks.items():
+            file.write(row.format(name, peak / 2 ** 20))
+        file.write(row.format(_('Total'), self.peak / 2 ** 20))
+
+
+def estimate(characters):
+    """
+    :param characters: the length of a document
+    :return: an estimate of the peak memory allocated to transduce the document at once in bytes
+    """
+    return characters * bytes_per_char
+
+
+def chunk_size(budget):
+    """
+    :param budget: the memory budget in bytes
+    :return: a chunk size for `transducer.Transducer.process_file` that keeps streaming within the budget
+    """
+    # A piece may be up to twice as long as a chunk, see `tokenizer.pieces`.
+    return max(min_chunk_size, budget // bytes_per_char // 4)
+
+
+def limit(budget):
+    """
+    Limits the address space of this process to its current size plus a budget, so that exceeding the budget raises
+    :py:exc:`MemoryError` rather than getting the process killed.
+    The limit is only set where the size of the address space can be read, that is on Linux.
+
+    :param budget: the memory budget in bytes
+    :return: whether the limit has been set
+    """
+    try:
+        import resource
+        with open('/proc/self/statm') as f:
+            size = int(f.read().split()[0]) * resource.getpagesize()
+        hard = resource.getrlimit(resource.RLIMIT_AS)[1]
+        soft = size + budget
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+    except (ImportError, OSError, ValueError):
+        return False
+    return True
@@ -13,28 +13,59 @@ Big thanks go to the maintainers of Prirucka for compiling a clear and reasonabl
 """
 
 # TODO: Support command line options:
-# user-defined patterns
 # gracious treatment of malformed documents
 
-# TODO: Print number of matches by pattern
 # TODO: Add interactive mode that asks in dubious cases
-# TODO: Enable the user to specify the encoding
 # TODO: Add tests
-# TODO: Account for <pre></pre>
 
 import argparse
+import codecs
 import gettext
+import io
+import os
 import sys
+from itertools import islice
 
+import batch
 import config
+from cache import TransductionCache
 import cs
 import en
+import memory
+import patterns
+import profiles
 import transducer
 
 # Prevent the cs and en imports from being optimized away
 assert cs
 assert en
 
+_ = gettext.translation(config.domain, localedir=config.localedir, fallback=True).gettext
+
+
+def encoding(name):
+    """
+    Validates the name of an encoding for :py:mod:`argparse`.
+    """
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        raise argparse.ArgumentTypeError(_('unknown encoding: {0}').format(name))
+    return name
+
+
+def open_file(path, mode, encoding):
+    """
+    Opens a text file, or the standard input or output if `path` is ``-``.
+    """
+    if path == '-':
+        stream = sys.stdin if mode == 'r' else sys.stdout
+        if not hasattr(stream, 'buffer'):
+            # The stream has been replaced by a text stream, for example in a test.
+            return stream
+        return io.TextIOWrapper(stream.buffer, encoding=encoding)
+    return open(path, mode, encoding=encoding)
+
 
 def main(args=None):
     gettext.bindtextdomain('argparse', config.localedir)
@@ -49,11 +80,85 @@ def main(args=None):
                     'The transducers are grouped into named groups.')
     parser = argparse.ArgumentParser(description=description, add_help=False)
     parser.add_argument('-h', '--help', action='store_true', help=_('show this help message and exit'))
-    parser.add_argument('infile', nargs='?', type=argparse.FileType('r', encoding='utf_8'), default=sys.stdin,
-                        help=_('input file'))
-    parser.add_argument('outfile', nargs='?', type=argparse.FileType('w', encoding='utf_8'), default=sys.stdout,
-                        help=_('ouptut file'))
-    # TODO: parser.add_argument('--encoding', nargs=1, type=str, default='utf_8')
+    parser.add_argument('infile', nargs='?', default='-', help=_('input file'))
+    parser.add_argument('outfile', nargs='?', default='-', help=_('ouptut file'))
+    parser.add_argument('--encoding', default='utf_8', type=encoding,
+                        help=_('Encoding of the input and output files (default: %(default)s)'))
+    parser.add_argument('--mmap', action='store_true',
+                        help=_('Maps the input file into memory and decodes only its content. '
+                               'Line endings are kept as they are.'))
+    parser.add_argument('--stream', action='store_true',
+                        help=_('Reads and transduces the input file in pieces that end with a newline, '
+                               'so that the memory use grows only with the length of the longest line of the file. '
+                               'A file without newlines, such as minified HTML, is read at once, and so is any file '
+                               'if some selected transducer may match a newline.'))
+    parser.add_argument('--chunk-size', type=int, default=65536, metavar='N',
+                        help=_('Number of characters to read at a time with --stream (default: %(default)s)'))
+    parser.add_argument('--batch', nargs='+', metavar='PATH',
+                        help=_('Transduces the files PATH instead of infile. A directory stands for the HTML files '
+                               'in its tree. Requires either --output-dir or --in-place.'))
+    parser.add_argument('--watch', nargs='+', metavar='PATH',
+                        help=_('Watches the files PATH and transduces every file that changes until interrupted. '
+                               'A directory stands for the HTML files in its tree. '
+                               'Requires either --output-dir or --in-place.'))
+    parser.add_argument('--interval', type=float, default=0.5, metavar='SECONDS',
+                        help=_('Number of seconds between two checks of the files with --watch (default: %(default)s)'))
+    parser.add_argument('--output-dir', metavar='DIR',
+                        help=_('Writes the files transduced by --batch or --watch to the directory DIR'))
+    parser.add_argument('--in-place', action='store_true',
+                        help=_('Overwrites the files transduced by --batch or --watch'))
+    parser.add_argument('--manifest', metavar='FILE',
+                        help=_('Records the digests of the files transduced by --batch or --watch and the '
+                               'configuration in FILE and skips the files that have not changed since the previous '
+                               'run'))
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help=_('Number of processes to use with --batch or --serve, or to transduce the shards of a '
+                               'large infile, 0 for the number of processors (default: %(default)s)'))
+    parser.add_argument('--serve', metavar='ADDRESS',
+                        help=_('Serves requests for transduction on ADDRESS, which is either PORT or HOST:PORT '
+                               'of a TCP socket or the path of a Unix socket, until interrupted. '
+                               'Every request and response is a line of JSON. See the module server for details.'))
+    parser.add_argument('--check', action='store_true',
+                        help=_('Writes no output and exits with status 1 if the transduction would change infile or '
+                               'a file of --batch. Every such file is reported with the line and column of its first '
+                               'change, and the search for changes stops there.'))
+    parser.add_argument('--all-changes', action='store_true',
+                        help=_('Reports all the changes of every file with --check, together with the text each '
+                               'change would replace'))
+    parser.add_argument('--stats', nargs='?', const='table', choices=['table', 'json'], metavar='FORMAT',
+                        help=_('Prints the number of matches, sweeps, skips and scanned characters and the running '
+                               'time of every transducer and group to the standard error output. '
+                               'FORMAT is table (default) or json.'))
+    parser.add_argument('--memory-report', action='store_true',
+                        help=_('Prints the peak memory allocated by tokenizing, by every transducer and by splicing '
+                               'to the standard error output. Slows the transduction down.'))
+    parser.add_argument('--max-memory', type=int, metavar='MIB',
+                        help=_('Limits the memory of the transduction to about MIB mebibytes. The input file is '
+                               'streamed if the selected transducers allow it. Otherwise the transduction fails '
+                               'with an error rather than running out of memory. A streamed file still needs memory '
+                               'for its longest line, so a file with very long lines may hit the limit.'))
+    parser.add_argument('--cache-size', type=int, metavar='N',
+                        help=_('Caches up to N transduced blocks of lines in memory, '
+                               'so that the blocks that repeat across the documents are transduced only once'))
+    parser.add_argument('--cache-file', metavar='FILE',
+                        help=_('Stores the cached blocks in the database FILE, so that they are reused by later runs. '
+                               'Cannot be combined with --jobs other than 1.'))
+    parser.add_argument('--patterns', nargs='+', default=[], metavar='FILE',
+                        help=_('Registers the groups and transducers defined in the JSON files FILE. '
+                               'See the module patterns for the format.'))
+    parser.add_argument('--profile-cache', metavar='DIR',
+                        help=_('Stores the analysis of the patterns of the selected transducers in the directory DIR, '
+                               'so that later runs with the same transducers and selection load it'))
+    # The pattern files register transducers, which must be known before the options that select them are added.
+    modules = [cs.__name__, en.__name__]
+    for path in parser.parse_known_args(args)[0].patterns:
+        if not path.endswith(patterns.extension):
+            parser.error(_('the name of a pattern file must end with {0}: {1}').format(patterns.extension, path))
+        try:
+            patterns.register(path)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        modules.append(path)
     transducer.master.add_arguments(parser)
 
     # Parse the command line arguments
@@ -64,9 +169,124 @@ def main(args=None):
         parser.print_help()
         parser.exit()
 
-    transducer.master.process_file(namespace.infile, namespace.outfile)
-    namespace.infile.close()
-    namespace.outfile.close()
+    if namespace.profile_cache is not None:
+        transducer.master.profile_cache = namespace.profile_cache
+        try:
+            profiles.load(namespace.profile_cache, transducer.master, modules)
+        except OSError as e:
+            parser.error(str(e))
+
+    chunk_size = namespace.chunk_size if namespace.stream else None
+    transducer.master.collect_statistics(namespace.stats is not None)
+    if namespace.cache_file is not None and namespace.jobs != 1:
+        parser.error(_('--cache-file cannot be combined with --jobs other than 1'))
+    if namespace.cache_size is not None or namespace.cache_file is not None:
+        transducer.master.cache = TransductionCache(namespace.cache_size or 4096, namespace.cache_file)
+    if namespace.max_memory is not None:
+        budget = namespace.max_memory * 2 ** 20
+        if transducer.master.is_separator('\n'):
+            chunk_size = min(chunk_size or namespace.chunk_size, memory.chunk_size(budget))
+        elif namespace.infile != '-' and os.path.isfile(namespace.infile):
+            needed = memory.estimate(os.path.getsize(namespace.infile))
+            if needed > budget:
+                parser.error(_('transducing {0} needs about {1} MiB, which exceeds --max-memory').format(
+                    namespace.infile, needed // 2 ** 20 + 1))
+        memory.limit(budget)
+    if namespace.memory_report:
+        transducer.master.memory = memory.MemoryReport()
+        transducer.master.memory.start()
+    if namespace.check:
+        if namespace.serve or namespace.watch:
+            parser.error(_('--check cannot be combined with --serve or --watch'))
+        every = namespace.all_changes
+        configuration = batch.capture(transducer.master, modules)
+        if namespace.batch:
+            sources = (source for source, _destination in batch.collect(namespace.batch))
+            failed = batch.run_check(configuration, sources, namespace.jobs or os.cpu_count(), namespace.encoding,
+                                     chunk_size, every)
+        else:
+            try:
+                infile = open_file(namespace.infile, 'r', namespace.encoding)
+            except OSError as e:
+                parser.error(str(e))
+            name = _('<stdin>') if namespace.infile == '-' else namespace.infile
+            found = transducer.master.check_file(infile, chunk_size)
+            failed = 0
+            for change in (found if every else islice(found, 1)):
+                sys.stdout.write(batch.format_change(name, change, every))
+                failed = 1
+            infile.close()
+        if transducer.master.cache is not None:
+            transducer.master.cache.close()
+        sys.exit(1 if failed else 0)
+    # The modules of the other modes import asyncio and the process pools, which take about as long as the rest of
+    # the start, so they are only imported by their modes.
+    if namespace.serve:
+        import server
+        jobs = namespace.jobs or os.cpu_count()
+        if jobs != 1 and transducer.master.cache is not None:
+            transducer.master.cache.close()
+        cache_size = None if transducer.master.cache is None else transducer.master.cache.maxsize
+        server.run(server.Server(transducer.master, modules, jobs, cache_size),
+                   namespace.serve)
+        if transducer.master.cache is not None:
+            transducer.master.cache.close()
+        sys.exit(0)
+    if namespace.watch:
+        if (namespace.output_dir is None) != namespace.in_place:
+            parser.error(_('--watch requires either --output-dir or --in-place'))
+        import watch
+        manifest = None if namespace.manifest is None else batch.load_manifest(namespace.manifest)
+        watcher = watch.Watcher(namespace.watch, namespace.output_dir, modules, namespace.encoding,
+                                chunk_size, manifest=manifest)
+        save = None if namespace.manifest is None else lambda files: batch.save_manifest(namespace.manifest, files)
+        watcher.run(namespace.interval, save)
+        if transducer.master.cache is not None:
+            transducer.master.cache.close()
+        sys.exit(0)
+    if namespace.batch:
+        if (namespace.output_dir is None) != namespace.in_place:
+            parser.error(_('--batch requires either --output-dir or --in-place'))
+        pairs = batch.collect(namespace.batch, namespace.output_dir)
+        configuration = batch.capture(transducer.master, modules)
+        jobs = namespace.jobs or os.cpu_count()
+        manifest = None if namespace.manifest is None else batch.load_manifest(namespace.manifest)
+        failed = batch.run(configuration, pairs, jobs, namespace.encoding, chunk_size, manifest=manifest)
+        if manifest is not None:
+            batch.save_manifest(namespace.manifest, manifest)
+        if transducer.master.cache is not None:
+            transducer.master.cache.close()
+        if namespace.stats:
+            transducer.master.print_statistics(sys.stderr, namespace.stats)
+        if namespace.memory_report:
+            transducer.master.memory.print_report(sys.stderr)
+        sys.exit(1 if failed else 0)
+
+    jobs = namespace.jobs or os.cpu_count()
+    if jobs != 1:
+        import shards
+        transducer.master.shard_pool = shards.ShardPool(transducer.master, modules, jobs)
+    try:
+        outfile = open_file(namespace.outfile, 'w', namespace.encoding)
+        if namespace.mmap and namespace.infile != '-':
+            transducer.master.process_mapped(namespace.infile, outfile, namespace.encoding, chunk_size)
+        else:
+            infile = open_file(namespace.infile, 'r', namespace.encoding)
+            transducer.master.process_file(infile, outfile, chunk_size)
+            infile.close()
+    except OSError as e:
+        parser.error(str(e))
+    except MemoryError:
+        parser.exit(1, _('{0}: error: the transduction has run out of memory\n').format(parser.prog))
+    outfile.close()
+    if transducer.master.shard_pool is not None:
+        transducer.master.shard_pool.close()
+    if transducer.master.cache is not None:
+        transducer.master.cache.close()
+    if namespace.stats:
+        transducer.master.print_statistics(sys.stderr, namespace.stats)
+    if namespace.memory_report:
+        transducer.master.memory.print_report(sys.stderr)
 
     sys.exit(0)
 
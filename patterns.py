@@ -0,0 +1,180 @@
+"""
+User-defined transducers loaded from pattern files.
+
+A pattern file is a JSON object with the keys:
+
+* ``groups``: an object that maps the names of new transducer groups to their descriptions (optional)
+* ``transducers``: a list of objects that define transducers
+
+A transducer is defined by an object with the key ``name``, the optional keys ``description``, ``examples`` and
+``groups`` (the names of the groups the transducer belongs to, new or registered), and one of the keys:
+
+* ``words``: a list of patterns of words whose separating spaces are replaced, see
+  `transducer.WordsNbspSubstituter`
+* ``dotted``: a list of patterns of abbreviations whose separating spaces are replaced, see
+  `transducer.DottedNbspSubstituter`
+* ``pattern``: a regular expression, together with ``replacement``, an object that maps the numbers of the groups
+  of the pattern to their replacements, and the optional keys ``align`` (``left`` or ``right``) and ``fixpoint``,
+  see `transducer.ReTransducer`
+
+Example::
+
+    {
+        "groups": {"titles": "Academic titles"},
+        "transducers": [
+            {"name": "titles.dr", "words": ["\\\\bDr\\\\.", "\\\\w"], "groups": ["titles", "cs"],
+             "examples": ["Dr. Novák"]}
+        ]
+    }
+"""
+
+import gettext
+import importlib
+import json
+import os
+import re
+import weakref
+
+import config
+import transducer
+
+_ = gettext.translation(config.domain, localedir=config.localedir, fallback=True).gettext
+
+#: the extension that tells the paths of pattern files from the names of modules, see `register`
+extension = '.json'
+
+# The absolute paths of the pattern files loaded into every `MasterTransducer`
+_loaded = weakref.WeakKeyDictionary()
+
+
+def register(name, master=None):
+    """
+    Registers transducers by importing a module or loading a pattern file.
+    A pattern file is loaded into a master only once.
+
+    :param name: the name of a module, or the path of a pattern file if it ends with `extension`
+    :param master: the `MasterTransducer` to load a pattern file into, `transducer.master` by default
+    """
+    if not name.endswith(extension):
+        importlib.import_module(name)
+        return
+    if master is None:
+        master = transducer.master
+    loaded = _loaded.setdefault(master, set())
+    path = os.path.abspath(name)
+    if path not in loaded:
+        load(path, master)
+        loaded.add(path)
+
+
+def load(path, master):
+    """
+    Loads a pattern file.
+
+    :param path: the path of the pattern file
+    :param master: the `MasterTransducer` to register the groups and transducers in
+    :raise ValueError: if the file is not a valid pattern file. Nothing is registered then.
+    :raise OSError: if the file cannot be read
+    """
+    with open(path, encoding='utf_8') as f:
+        try:
+            definitions = json.load(f)
+        except ValueError as e:
+            raise ValueError(_('{0}: invalid JSON: {1}').format(path, e))
+    try:
+        groups, transducers = parse(definitions, master)
+    except ValueError as e:
+        raise ValueError('{0}: {1}'.format(path, e))
+    for name, description in groups:
+        master.add_group(name, description)
+    for t, group_names in transducers:
+        master.add(t, [master.groups[name] for name in group_names])
+
+
+def parse(definitions, master):
+    """
+    Constructs the groups and transducers defined by the content of a pattern file without registering them.
+
+    :param definitions: the parsed JSON object
+    :param master: the `MasterTransducer` that defines the registered groups and transducers
+    :return: a pair of the list of the pairs `(name, description)` of the new groups and the list of the pairs of
+        the new transducers and the names of their groups
+    :raise ValueError: if the definitions are not valid
+    """
+    if not isinstance(definitions, dict):
+        raise ValueError(_('a pattern file must contain a JSON object'))
+    unknown = set(definitions) - {'groups', 'transducers'}
+    if unknown:
+        raise ValueError(_('unknown keys: {0}').format(', '.join(sorted(unknown))))
+    groups = definitions.get('groups', {})
+    if not isinstance(groups, dict):
+        raise ValueError(_('"groups" must be an object'))
+    for name, description in groups.items():
+        if name in master.groups:
+            raise ValueError(_('duplicate group: {0}').format(name))
+        if description is not None and not isinstance(description, str):
+            raise ValueError(_('the description of the group {0} must be a string').format(name))
+    transducers = []
+    names = set()
+    for definition in definitions.get('transducers', []):
+        t, group_names = _transducer(definition)
+        if t.name in master.transducers or t.name in names:
+            raise ValueError(_('duplicate transducer: {0}').format(t.name))
+        names.add(t.name)
+        for name in group_names:
+            if name not in groups and name not in master.groups:
+                raise ValueError(_('unknown group of the transducer {0}: {1}').format(t.name, name))
+        transducers.append((t, group_names))
+    return sorted(groups.items()), transducers
+
+
+def _transducer(definition):
+    """
+    :return: a pair of the transducer defined by an object of a pattern file and the names of its groups
+    """
+    if not isinstance(definition, dict) or not isinstance(definition.get('name'), str):
+        raise ValueError(_('every transducer must be an object with a "name"'))
+    name = definition['name']
+    kinds = [kind for kind in ('words', 'dotted', 'pattern') if kind in definition]
+    if len(kinds) != 1:
+        raise ValueError(_('the transducer {0} must have exactly one of "words", "dotted" and "pattern"').format(name))
+    kind = kinds[0]
+    allowed = {'name', 'description', 'examples', 'groups', kind}
+    if kind == 'pattern':
+        allowed |= {'replacement', 'align', 'fixpoint'}
+    unknown = set(definition) - allowed
+    if unknown:
+        raise ValueError(_('unknown keys of the transducer {0}: {1}').format(name, ', '.join(sorted(unknown))))
+    description = definition.get('description')
+    examples = definition.get('examples')
+    group_names = definition.get('groups', [])
+    if not isinstance(group_names, list):
+        raise ValueError(_('the groups of the transducer {0} must be a list').format(name))
+    try:
+        if kind == 'pattern':
+            pattern = definition['pattern']
+            groups = re.compile(pattern).groups
+            replacement = definition.get('replacement')
+            if not isinstance(replacement, dict) or not replacement:
+                raise ValueError(_('"replacement" must be a non-empty object'))
+            if not all(isinstance(value, str) for value in replacement.values()):
+                raise ValueError(_('the values of "replacement" must be strings'))
+            replacement = {int(group): value for group, value in replacement.items()}
+            align = transducer.ReTransducer.Align(definition.get('align', 'left'))
+            fixpoint = definition.get('fixpoint', True)
+            if not isinstance(fixpoint, bool):
+                raise ValueError(_('"fixpoint" must be true or false'))
+            t = transducer.ReTransducer(pattern, replacement, align, fixpoint, name, description, examples)
+            if max(replacement) > groups or min(replacement) < 0:
+                raise ValueError(_('the replacement refers to a group the pattern does not have'))
+        else:
+            words = definition[kind]
+            if not isinstance(words, list) or len(words) < 2 or not all(isinstance(word, str) for word in words):
+                raise ValueError(_('"{0}" must be a list of at least two strings').format(kind))
+            for word in words:
+                re.compile(word)
+            cls = transducer.WordsNbspSubstituter if kind == 'words' else transducer.DottedNbspSubstituter
+            t = cls(words, name, description, examples)
+    except (re.error, TypeError, ValueError) as e:
+        raise ValueError(_('the transducer {0}: {1}').format(name, e))
+    return t, group_names
@@ -0,0 +1,100 @@
+"""
+Compiled profiles: the results of the analysis of the patterns of a selection of transducers, cached on disk.
+
+Building the pipeline of a selection analyzes every pattern: `transducer.WordsNbspSubstituter.fusable` decides how
+the words are matched, and `transducer.ReTransducer.reach`, `transducer.ReTransducer.required` and
+`transducer.ReTransducer.is_separator` bound the searches. A profile stores these results in a JSON file named by a
+digest of the sources of the transducers and of the selection, so a later run with the same sources and selection
+loads them instead of repeating the analysis. The compiled regular expressions are not stored, since unpickling
+a regular expression compiles it again.
+The worker processes load the profile too when they are configured (see `batch.configure`), so they need not
+inherit the analyses from the main process.
+"""
+
+import hashlib
+import json
+import os
+
+import batch
+import transducer
+
+# The version of the format of the profile files
+profile_format = 1
+
+
+def key(master, modules):
+    """
+    Identifies the sources and the selection of a `MasterTransducer`.
+
+    :param master: the configured `MasterTransducer`
+    :param modules: the names of the modules and the paths of the pattern files that register the transducers,
+        see `patterns.register`
+    :return: a hexadecimal digest
+    """
+    result = hashlib.sha256(json.dumps([[t.name for t in master.selected], master.fused]).encode('utf_8'))
+    result.update(batch.version(modules).encode('ascii'))
+    return result.hexdigest()
+
+
+def path(directory, master, modules):
+    """
+    :return: the path of the profile of a `MasterTransducer` in a directory
+    """
+    return os.path.join(directory, '{0}.json'.format(key(master, modules)))
+
+
+def analyses(master):
+    """
+    Analyzes the selected transducers and those in the pipeline.
+
+    :return: a dictionary that maps the names of the analyzed transducers to their analyses
+        (see `transducer.ReTransducer.analysis`)
+    """
+    result = {}
+    for t in list(master.selected) + list(master.pipeline()):
+        if isinstance(t, transducer.ReTransducer):
+            result[t.name] = t.analysis()
+    return result
+
+
+def restore(master, profile):
+    """
+    Restores the analyses of a profile into the selected transducers and the pipeline.
+    The analyses of the selected transducers are restored first, since they determine the pipeline.
+
+    :param master: the configured `MasterTransducer`
+    :param profile: a dictionary returned by `analyses`
+    """
+    for t in list(master.selected):
+        if isinstance(t, transducer.ReTransducer) and t.name in profile:
+            t.restore(profile[t.name])
+    for t in master.pipeline():
+        if isinstance(t, transducer.ReTransducer) and t.name in profile:
+            t.restore(profile[t.name])
+
+
+def load(directory, master, modules):
+    """
+    Restores the profile of a `MasterTransducer` from a directory, or analyzes the transducers and saves their profile
+    there if there is none. The profile is replaced only after it has been written completely.
+
+    :param directory: the directory of the profiles
+    :param master: the configured `MasterTransducer`
+    :param modules: see `key`
+    :return: whether the profile has been restored
+    """
+    profile_path = path(directory, master, modules)
+    try:
+        with open(profile_path, encoding='utf_8') as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        profile = None
+    if profile is not None and profile.get('format') == profile_format:
+        restore(master, profile['transducers'])
+        return True
+    os.makedirs(directory, exist_ok=True)
+    temporary = '{0}.{1}.tmp'.format(profile_path, os.getpid())
+    with open(temporary, 'w', encoding='utf_8') as f:
+        json.dump({'format': profile_format, 'transducers': analyses(master)}, f, indent=1, sort_keys=True)
+    os.replace(temporary, profile_path)
+    return False
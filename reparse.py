@@ -0,0 +1,309 @@
+"""
+Static analysis of regular expressions used by the transducers.
+"""
+
+import re
+
+# The parser of the `re` module is not a public API. It has been renamed in Python 3.11 and its parse tree may change
+# in any release, so every analysis below falls back to the most conservative answer when the parsing fails.
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # pragma: no cover
+    # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+_UNBOUNDED = sre_constants.MAXREPEAT - 1
+
+
+def parse(pattern):
+    """
+    Parses a regular expression.
+
+    :param pattern: a compiled regular expression
+    :return: the parse tree of the expression, or `None` if the expression cannot be parsed
+    """
+    try:
+        return sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None
+
+
+def _children(av):
+    """
+    Yields the nested subpatterns of the argument of a parse tree node.
+    """
+    if isinstance(av, sre_parse.SubPattern):
+        yield av
+    elif isinstance(av, (tuple, list)):
+        for item in av:
+            yield from _children(item)
+
+
+def _sets_flags(av):
+    """
+    Tells whether the argument of a `SUBPATTERN` node sets or clears inline flags for its scope, as in ``(?i:kč)``.
+    """
+    # Python < 3.6 has no scoped flags, and its argument is a pair `(group, subpattern)`.
+    return len(av) == 4 and bool(av[1] or av[2])
+
+
+def _uses_scoped_flags(subpattern):
+    for op, av in subpattern:
+        if op is sre_constants.SUBPATTERN and _sets_flags(av):
+            return True
+        if any(_uses_scoped_flags(child) for child in _children(av)):
+            return True
+    return False
+
+
+def _lookaround_width(subpattern):
+    width = 0
+    for op, av in subpattern:
+        if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            width += av[1].getwidth()[1]
+        for child in _children(av):
+            width += _lookaround_width(child)
+    return width
+
+
+def reach(pattern):
+    """
+    Computes an upper bound on the number of consecutive characters that a match of a regular expression inspects,
+    including the characters examined by lookaround assertions and word boundaries.
+
+    A replacement made at some position can only create or destroy matches that start less than `reach` characters
+    before it.
+
+    :param pattern: a compiled regular expression
+    :return: the bound, or `None` if the expression can inspect an unbounded number of characters
+    """
+    parsed = parse(pattern)
+    if parsed is None:
+        return None
+    width = parsed.getwidth()[1] + _lookaround_width(parsed) + 1
+    if width >= _UNBOUNDED:
+        return None
+    return width
+
+
+def _references_groups(subpattern):
+    for op, av in subpattern:
+        if op in (sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS):
+            return True
+        if any(_references_groups(child) for child in _children(av)):
+            return True
+    return False
+
+
+def is_embeddable(pattern):
+    """
+    Tells whether a regular expression keeps its meaning when it is embedded in a larger expression.
+    This holds for expressions that use the default flags, name no groups and do not refer to groups.
+
+    :param pattern: a compiled regular expression
+    """
+    if pattern.flags != re.UNICODE or pattern.groupindex:
+        return False
+    parsed = parse(pattern)
+    return parsed is not None and not _references_groups(parsed)
+
+
+_CATEGORIES = {getattr(sre_constants, 'CATEGORY_' + name): re.compile(regex) for name, regex in [
+    ('DIGIT', r'\d'), ('NOT_DIGIT', r'\D'), ('SPACE', r'\s'), ('NOT_SPACE', r'\S'), ('WORD', r'\w'),
+    ('NOT_WORD', r'\W'), ('LINEBREAK', r'\n'), ('NOT_LINEBREAK', r'[^\n]')]}
+
+
+def _in_class(items, code):
+    negate = False
+    found = False
+    for op, av in items:
+        if op is sre_constants.NEGATE:
+            negate = True
+        elif op is sre_constants.LITERAL:
+            found = found or av == code
+        elif op is sre_constants.RANGE:
+            found = found or av[0] <= code <= av[1]
+        elif op is sre_constants.CATEGORY and av in _CATEGORIES:
+            found = found or _CATEGORIES[av].match(chr(code)) is not None
+        else:
+            return True
+    return found != negate
+
+
+def _can_match(subpattern, code):
+    for op, av in subpattern:
+        if op is sre_constants.LITERAL:
+            if av == code:
+                return True
+        elif op is sre_constants.NOT_LITERAL:
+            if av != code:
+                return True
+        elif op is sre_constants.IN:
+            if _in_class(av, code):
+                return True
+        elif op is sre_constants.ANY:
+            return True
+        if any(_can_match(child, code) for child in _children(av)):
+            return True
+    return False
+
+
+def can_match(pattern, chars):
+    """
+    Tells whether a regular expression can consume any of the given characters, including in lookaround assertions.
+    The answer errs on the side of `True`.
+
+    :param pattern: a compiled regular expression
+    :param chars: a string of characters
+    """
+    parsed = parse(pattern)
+    if parsed is None or pattern.flags & re.IGNORECASE or _uses_scoped_flags(parsed):
+        return True
+    return any(_can_match(parsed, ord(char)) for char in chars)
+
+
+_BOUNDARIES = (sre_constants.AT_BOUNDARY, sre_constants.AT_NON_BOUNDARY)
+
+
+def _uses_anchors(subpattern):
+    for op, av in subpattern:
+        if op is sre_constants.AT and av not in _BOUNDARIES:
+            return True
+        if any(_uses_anchors(child) for child in _children(av)):
+            return True
+    return False
+
+
+def separates(pattern, char):
+    """
+    Tells whether a character splits a string into pieces that a regular expression matches independently.
+    This holds if no match can be empty, consume the character or look at it, and the expression uses no anchors
+    other than word boundaries. The pieces may then be transduced separately, with the character ending every piece
+    but the last one.
+    The answer errs on the side of `False`.
+
+    :param pattern: a compiled regular expression
+    :param char: a single character
+    """
+    parsed = parse(pattern)
+    if parsed is None or parsed.getwidth()[0] == 0 or can_match(pattern, char):
+        return False
+    if _uses_anchors(parsed):
+        return False
+    # A word boundary treats the start and the end of a piece as a non-word character.
+    return re.match(r'\w', char) is None
+
+
+def _group(subpattern, group):
+    for op, av in subpattern:
+        if op is sre_constants.SUBPATTERN and av[0] == group:
+            return av[-1]
+        for child in _children(av):
+            found = _group(child, group)
+            if found is not None:
+                return found
+    return None
+
+
+def _language(subpattern, limit, assertions=False):
+    """
+    :param assertions: whether to treat the anchors and word boundaries as empty strings rather than fail
+    """
+    strings = {''}
+    for op, av in subpattern:
+        if assertions and op is sre_constants.AT:
+            continue
+        if op is sre_constants.LITERAL:
+            options = {chr(av)}
+        elif op is sre_constants.IN and all(item_op is sre_constants.LITERAL for item_op, _ in av):
+            # An alternation of single characters is parsed as a character class.
+            options = {chr(code) for _, code in av}
+        elif op is sre_constants.SUBPATTERN and not _sets_flags(av):
+            options = _language(av[-1], limit, assertions)
+        elif op is sre_constants.BRANCH:
+            options = set()
+            for branch in av[1]:
+                branch_options = _language(branch, limit, assertions)
+                if branch_options is None:
+                    return None
+                options |= branch_options
+        else:
+            return None
+        if options is None or len(strings) * len(options) > limit:
+            return None
+        strings = {string + option for string in strings for option in options}
+    return strings
+
+
+def group_language(pattern, group, limit=64):
+    """
+    Finds the strings that a group of a regular expression can match, provided that there are only a few of them.
+    Only literals, alternations, classes of literals and nested groups are supported.
+
+    :param pattern: a compiled regular expression
+    :param group: the number of the group, 0 for the whole expression
+    :param limit: the maximum number of strings
+    :return: the set of the strings, or `None` if it cannot be determined
+    """
+    if pattern.flags & re.IGNORECASE:
+        return None
+    parsed = parse(pattern)
+    if parsed is None or _uses_scoped_flags(parsed):
+        return None
+    if group != 0:
+        parsed = _group(parsed, group)
+    if parsed is None:
+        return None
+    return _language(parsed, limit)
+
+
+def _runs(subpattern, limit):
+    """
+    Yields sets of strings such that every match of the subpattern contains one of the strings of every set.
+    """
+    run = {''}
+    for op, av in subpattern:
+        if op is sre_constants.ASSERT and av[0] == 1:
+            # The text of a lookahead follows the run, but the next items match from the same position.
+            options = _language(av[1], limit, True)
+            if options is not None and len(run) * len(options) <= limit:
+                yield {string + option for string in run for option in options}
+            continue
+        options = _language([(op, av)], limit, True)
+        if options is not None and len(run) * len(options) <= limit:
+            run = {string + option for string in run for option in options}
+            continue
+        yield run
+        run = {''}
+        if options is not None:
+            run = options
+        elif op is sre_constants.SUBPATTERN and not _sets_flags(av):
+            yield from _runs(av[-1], limit)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+            yield from _runs(av[2], limit)
+    yield run
+
+
+def required(pattern, limit=16):
+    """
+    Finds strings one of which occurs in every match of a regular expression.
+    If there are several such sets of strings, the one with the longest shortest string is chosen,
+    and then the one with the fewest strings.
+
+    :param pattern: a compiled regular expression
+    :param limit: the maximum number of strings
+    :return: the set of the strings, or `None` if none is found
+    """
+    if pattern.flags & re.IGNORECASE:
+        return None
+    parsed = parse(pattern)
+    if parsed is None:
+        return None
+    best = None
+    for strings in _runs(parsed, limit):
+        if '' in strings:
+            continue
+        if best is None or (min(map(len, strings)), -len(strings)) > (min(map(len, best)), -len(best)):
+            best = strings
+    return best
@@ -0,0 +1,274 @@
+"""
+A server that keeps the transducers compiled and transduces HTML documents sent over a socket.
+
+The server listens on a Unix socket or a local TCP port. A client sends requests and receives responses as lines of
+JSON objects encoded in UTF-8. A request has the keys:
+
+* ``html``: the HTML document to transduce (required)
+* ``id``: any value, copied to the response so that the client can pair the responses with the requests
+* ``groups``: a list of names of transducer groups to select
+* ``transducers``: a list of names of transducers to select
+* ``fused``: whether to merge the independent transducers (see `transducer.MasterTransducer.pipeline`)
+
+If neither ``groups`` nor ``transducers`` is given, the transducers selected when the server was started are used.
+A response has the keys ``id``, ``html`` (or ``error`` if the request has failed), ``seconds`` (the time spent
+transducing) and ``latency`` (the time from receiving the request to sending the response).
+The requests of a connection are processed concurrently, so their responses may come in a different order.
+
+Example: ``python3 nbspacer.py --serve /tmp/nbspacer.sock --jobs 4``
+"""
+
+import asyncio
+import collections
+import gettext
+import json
+import signal
+import sys
+import time
+
+import batch
+import config
+import transducer
+
+_ = gettext.translation(config.domain, localedir=config.localedir, fallback=True).gettext
+
+
+def transduce(configuration, html):
+    """
+    Transduces a HTML document in a worker.
+
+    :param configuration: a tuple returned by `batch.capture`
+    :param html: a HTML formatted string
+    :return: a pair of the transduced document and the time spent transducing it in seconds
+    """
+    batch.configure(configuration)
+    start = time.perf_counter()
+    html = transducer.master.transduce_html(html)
+    return html, time.perf_counter() - start
+
+
+def parse_address(address):
+    """
+    Parses the address to listen on.
+
+    :param address: ``PORT`` or ``HOST:PORT`` for a TCP socket, anything else is the path of a Unix socket
+    :return: a pair `(host, port)` for a TCP socket, or the path of a Unix socket
+    """
+    host, colon, port = address.rpartition(':')
+    if port.isdigit() and '/' not in address:
+        return host or 'localhost', int(port)
+    return address
+
+
+class Server:
+    """
+    Transduces the documents sent by clients using a pool of workers.
+    With a single worker, the documents are transduced in a thread of this process by `transducer.master`.
+    Otherwise every worker is a process with its own copy of `transducer.master`.
+    In either case, a worker keeps the transducers it has used compiled.
+    """
+
+    #: the maximum length of a request in bytes
+    limit = 1 << 26
+
+    #: the number of latencies kept for `report`
+    latencies_kept = 10000
+
+    def __init__(self, master, modules, jobs=1, cache_size=None):
+        """
+        :param master: the configured `MasterTransducer`. Its selection is the default selection of the requests.
+        :param modules: the names of the modules that register the transducers, for example ``['cs', 'en']``
+        :param jobs: the number of workers
+        :param cache_size: the size of the `cache.TransductionCache` of every worker, or `None` for no cache
+        """
+        assert jobs >= 1
+        self.jobs = jobs
+        self.master = master
+        self.modules = tuple(modules)
+        self.selected = tuple(t.name for t in master.selected)
+        self.fused = master.fused
+        self.cache_size = cache_size
+        self.backend = master.backend.value
+        self.nbsp = master.nbsp.name
+        self.profile_cache = master.profile_cache
+        if jobs == 1:
+            from concurrent.futures import ThreadPoolExecutor
+            self.executor = ThreadPoolExecutor(1)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(jobs)
+        self.requests = 0
+        self.errors = 0
+        self.latencies = collections.deque(maxlen=self.latencies_kept)
+
+    def warm(self):
+        """
+        Compiles all the registered transducers and starts the workers, so that the first requests do not pay for it.
+        The worker processes inherit the compiled patterns if they are forked.
+        `start` calls this before listening, because a worker forked later would inherit the open sockets and keep
+        the connections open after the server has closed them.
+        """
+        for t in self.master.transducers.values():
+            if isinstance(t, transducer.ReTransducer):
+                t.required
+        configuration = self.configuration({})
+        for future in [self.executor.submit(batch.configure, configuration) for worker in range(self.jobs)]:
+            future.result()
+
+    def configuration(self, request):
+        """
+        :param request: a request
+        :return: the configuration of the worker for the request as returned by `batch.capture`
+        :raise ValueError: if the request names an unknown group or transducer
+        """
+        names = []
+        for name in request.get('groups') or []:
+            group = self.master.groups.get(name)
+            if group is None:
+                raise ValueError(_('unknown group: {0}').format(name))
+            names.extend(t.name for t in group.transducers)
+        for name in request.get('transducers') or []:
+            if name not in self.master.transducers:
+                raise ValueError(_('unknown transducer: {0}').format(name))
+            names.append(name)
+        selected = tuple(collections.OrderedDict.fromkeys(names)) or self.selected
+        fused = bool(request.get('fused', self.fused))
+        return self.modules, selected, fused, False, self.cache_size, self.backend, self.nbsp, self.profile_cache
+
+    async def respond(self, line):
+        """
+        Processes a request.
+
+        :param line: a line of JSON encoded in UTF-8
+        :return: the response
+        """
+        start = time.perf_counter()
+        response = collections.OrderedDict([('id', None)])
+        try:
+            request = json.loads(line.decode('utf_8'))
+            if not isinstance(request, dict):
+                raise ValueError(_('the request is not an object'))
+            response['id'] = request.get('id')
+            html = request.get('html')
+            if not isinstance(html, str):
+                raise ValueError(_('the request has no html'))
+            configuration = self.configuration(request)
+            loop = asyncio.get_event_loop()
+            response['html'], response['seconds'] = await loop.run_in_executor(self.executor, transduce,
+                                                                               configuration, html)
+        except Exception as e:
+            self.errors += 1
+            response['error'] = str(e) or type(e).__name__
+        response['latency'] = time.perf_counter() - start
+        self.requests += 1
+        self.latencies.append(response['latency'])
+        return response
+
+    async def handle(self, reader, writer):
+        """
+        Serves a connection until the client closes it.
+        """
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def send(response):
+            async with lock:
+                writer.write(json.dumps(response).encode('utf_8') + b'\n')
+                await writer.drain()
+
+        async def answer(line):
+            await send(await self.respond(line))
+
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # The request is longer than `limit`. The rest of the connection cannot be parsed.
+                self.requests += 1
+                self.errors += 1
+                await send(collections.OrderedDict([('id', None), ('error', _('the request is too long'))]))
+                break
+            if not line:
+                break
+            if not line.strip():
+                continue
+            task = asyncio.ensure_future(answer(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+        writer.close()
+
+    async def start(self, address):
+        """
+        Warms up the workers and starts listening.
+
+        :param address: an address accepted by `parse_address`
+        :return: the :py:class:`asyncio.Server`
+        """
+        self.warm()
+        address = parse_address(address)
+        if isinstance(address, tuple):
+            return await asyncio.start_server(self.handle, address[0], address[1], limit=self.limit)
+        return await asyncio.start_unix_server(self.handle, address, limit=self.limit)
+
+    def close(self):
+        """
+        Stops the workers.
+        """
+        self.executor.shutdown()
+
+    def report(self):
+        """
+        Summarizes the latencies of the recent requests.
+
+        :return: a dictionary with the number of requests and errors, and the mean, median, 95th percentile and
+            maximum latency in seconds
+        """
+        latencies = sorted(self.latencies)
+        report = collections.OrderedDict([('requests', self.requests), ('errors', self.errors)])
+        if latencies:
+            report['mean'] = sum(latencies) / len(latencies)
+            report['median'] = latencies[len(latencies) // 2]
+            report['p95'] = latencies[min(len(latencies) - 1, len(latencies) * 95 // 100)]
+            report['max'] = latencies[-1]
+        return report
+
+    def print_report(self, file=sys.stderr):
+        report = self.report()
+        file.write(_('Requests: {0}, errors: {1}\n').format(report['requests'], report['errors']))
+        if 'mean' in report:
+            file.write(_('Latency [s]: mean {0:.6f}, median {1:.6f}, 95th percentile {2:.6f}, max {3:.6f}\n').format(
+                report['mean'], report['median'], report['p95'], report['max']))
+
+
+def run(server, address, file=sys.stderr):
+    """
+    Serves until interrupted or terminated, then prints the report of the latencies.
+
+    :param server: a `Server`
+    :param address: an address accepted by `parse_address`
+    :param file: the file to print the address and the report to
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    listener = None
+    try:
+        loop.add_signal_handler(signal.SIGTERM, loop.stop)
+    except NotImplementedError:
+        # Windows
+        pass
+    try:
+        listener = loop.run_until_complete(server.start(address))
+        file.write(_('Listening on {0}\n').format(', '.join(str(socket.getsockname()) for socket in listener.sockets)))
+        file.flush()
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if listener is not None:
+            listener.close()
+            loop.run_until_complete(listener.wait_closed())
+        server.close()
+        loop.close()
+        server.print_report(file)
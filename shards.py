@@ -0,0 +1,115 @@
+"""
+Transduction of a single large document by a pool of processes.
+
+The content of the document is split into shards that end with a newline. If a newline is a separator for the
+selected transducers (see `transducer.Transducer.is_separator`), no match can span it, so the shards are transduced
+independently by the workers and the results are joined together with their index maps. The result is the same as
+that of a sequential transduction.
+"""
+
+import batch
+import transducer
+from indexmap import IndexMap
+
+
+def transduce(configuration, shard):
+    """
+    Transduces a shard in a worker.
+
+    :param configuration: a tuple returned by `batch.capture`
+    :param shard: a string
+    :return: a triple of the transduced string, its `IndexMap` and the statistics taken by
+        `MasterTransducer.take_statistics` if they are collected (or `None`)
+    """
+    batch.configure(configuration)
+    # A forked worker inherits the pool of the master, which it must not use.
+    transducer.master.shard_pool = None
+    string, indices = transducer.master.substitute(shard, IndexMap.identity(len(shard)))
+    statistics = None
+    if transducer.master.statistics is not None:
+        statistics = transducer.master.take_statistics()
+    return string, indices, statistics
+
+
+def split(string, size, separator='\n'):
+    """
+    Splits a string into shards of about a given size that end with a separator.
+    A shard is longer if the separator does not occur soon enough, and the last shard need not end with it.
+
+    :param string: the string to split
+    :param size: the preferred length of a shard
+    :param separator: a single character
+    :return: a list of `(start, end)` spans that cover the string
+    """
+    spans = []
+    start = 0
+    n = len(string)
+    while n - start > size:
+        cut = string.find(separator, start + size - 1) + 1
+        if cut == 0:
+            break
+        spans.append((start, cut))
+        start = cut
+    spans.append((start, n))
+    return spans
+
+
+class ShardPool:
+    """
+    Transduces the strings longer than `shard_size` in shards using a pool of worker processes.
+    Every worker has its own copy of `transducer.master`, configured as the master was when the pool was created.
+    """
+
+    #: the preferred length of a shard. A shard should take long enough to transduce to outweigh the cost of sending it
+    #: to a worker and the result back.
+    shard_size = 1 << 20
+
+    def __init__(self, master, modules, jobs):
+        """
+        :param master: the configured `MasterTransducer`
+        :param modules: the names of the modules that register the transducers, see `batch.capture`
+        :param jobs: the number of worker processes
+        """
+        assert jobs > 1
+        self.master = master
+        self.jobs = jobs
+        self.configuration = batch.capture(master, modules)
+        self._executor = None
+
+    def substitute(self, string, indices):
+        """
+        Translates a string like `MasterTransducer.substitute` if it can be split into shards.
+
+        :param string: the string to be translated
+        :param indices: the `IndexMap` of the string
+        :return: the pair of the translated string and its `IndexMap`, or `None` if the string is not long enough,
+            the selected transducers do not let a newline split it or `indices` is not the identity
+        """
+        if len(string) < 2 * self.shard_size or not indices.is_identity() or not self.master.is_separator('\n'):
+            return None
+        spans = split(string, self.shard_size)
+        if len(spans) < 2:
+            return None
+        if self._executor is None:
+            # Importing the process pool takes about as long as the rest of the start, so it is only imported when
+            # needed.
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(self.jobs)
+        futures = [self._executor.submit(transduce, self.configuration, string[start:end]) for start, end in spans]
+        strings = []
+        maps = []
+        for future in futures:
+            shard, shard_indices, statistics = future.result()
+            strings.append(shard)
+            maps.append(shard_indices)
+            if statistics is not None and self.master.statistics is not None:
+                self.master.merge_statistics(statistics)
+        return ''.join(strings), IndexMap.concatenate(maps, [start for start, _end in spans])
+
+    def close(self):
+        """
+        Shuts the workers down.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
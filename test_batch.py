@@ -0,0 +1,125 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import TestCase
+
+import batch
+import cs
+import en
+import transducer
+from nbspacer import main
+
+assert cs
+assert en
+
+
+class TestBatch(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.directory.name, 'input')
+        self.output = os.path.join(self.directory.name, 'output')
+        self.files = {
+            'index.html': '<p>k mostu a 1 000 000</p>',
+            os.path.join('a', 'b.htm'): 's bratrem <b>v Plzni</b>',
+            os.path.join('a', 'c.html'): 'o páté',
+        }
+        for name, html in self.files.items():
+            path = os.path.join(self.input, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf_8') as f:
+                f.write(html)
+        with open(os.path.join(self.input, 'notes.txt'), 'w') as f:
+            f.write('k mostu')
+        with open(os.path.join(self.input, 'a', 'broken.html'), 'wb') as f:
+            f.write(b'k \xff mostu')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assert_output(self, directory):
+        for name, html in self.files.items():
+            with open(os.path.join(directory, name), encoding='utf_8') as f:
+                self.assertEqual(f.read(), transducer.master.transduce_html(html))
+
+    def test_collect(self):
+        pairs = list(batch.collect([self.input], self.output))
+        self.assertEqual([os.path.relpath(source, self.input) for source, destination in pairs],
+                         ['index.html', os.path.join('a', 'b.htm'), os.path.join('a', 'broken.html'),
+                          os.path.join('a', 'c.html')])
+        for source, destination in pairs:
+            self.assertEqual(os.path.relpath(source, self.input), os.path.relpath(destination, self.output))
+
+    def test_run(self):
+        transducer.master.select(transducer.master.transducers.keys())
+        configuration = batch.capture(transducer.master, ['cs', 'en'])
+        for jobs in [1, 2]:
+            errors = StringIO()
+            failed = batch.run(configuration, batch.collect([self.input], self.output), jobs, file=errors)
+            self.assertEqual(failed, 1)
+            self.assertIn('broken.html', errors.getvalue())
+            self.assertFalse(os.path.exists(os.path.join(self.output, 'a', 'broken.html')))
+            self.assert_output(self.output)
+
+    def test_main_in_place(self):
+        with self.assertRaises(SystemExit) as cm:
+            main(['--batch', os.path.join(self.input, 'index.html'), os.path.join(self.input, 'a', 'c.html'),
+                  '--in-place', '--jobs', '2'])
+        self.assertEqual(cm.exception.code, 0)
+        transducer.master.select(transducer.master.transducers.keys())
+        with open(os.path.join(self.input, 'index.html'), encoding='utf_8') as f:
+            self.assertEqual(f.read(), transducer.master.transduce_html(self.files['index.html']))
+
+    def test_run_statistics(self):
+        transducer.master.select(['cs.ksvz'])
+        transducer.master.collect_statistics()
+        try:
+            configuration = batch.capture(transducer.master, ['cs', 'en'])
+            batch.run(configuration, batch.collect([self.input], self.output), 2, file=StringIO())
+            self.assertEqual(transducer.master.statistics_report()['transducers']['cs.ksvz']['matches'], 3)
+        finally:
+            transducer.master.collect_statistics(False)
+
+    def test_manifest(self):
+        transducer.master.select(transducer.master.transducers.keys())
+        configuration = batch.capture(transducer.master, ['cs', 'en'])
+        manifest = {}
+        batch.run(configuration, batch.collect([self.input], self.output), 1, file=StringIO(), manifest=manifest)
+        self.assertEqual(len(manifest), 3)
+        index = os.path.join(self.output, 'index.html')
+        changed = os.path.join(self.output, 'a', 'c.html')
+        path = os.path.join(self.directory.name, 'manifest.json')
+        batch.save_manifest(path, manifest)
+        manifest = batch.load_manifest(path)
+        for jobs, html in [(1, 'u babičky'), (2, 'o páté')]:
+            with open(os.path.join(self.input, 'a', 'c.html'), 'w', encoding='utf_8') as f:
+                f.write(html)
+            os.utime(index, ns=(0, 0))
+            os.utime(changed, ns=(0, 0))
+            batch.run(configuration, batch.collect([self.input], self.output), jobs, file=StringIO(),
+                      manifest=manifest)
+            self.assertEqual(os.stat(index).st_mtime_ns, 0)
+            with open(changed, encoding='utf_8') as f:
+                self.assertEqual(f.read(), transducer.master.transduce_html(html))
+        transducer.master.select(['cs.ksvz'])
+        batch.run(configuration, batch.collect([self.input], self.output), 1, file=StringIO(), manifest=manifest)
+        self.assertNotEqual(os.stat(index).st_mtime_ns, 0)
+
+    def test_check(self):
+        transducer.master.select(transducer.master.transducers.keys())
+        configuration = batch.capture(transducer.master, ['cs', 'en'])
+        sources = [os.path.join(self.input, 'index.html'), os.path.join(self.input, 'a', 'broken.html')]
+        for jobs in [1, 2]:
+            for every, count in [(False, 1), (True, 4)]:
+                output = StringIO()
+                errors = StringIO()
+                self.assertEqual(batch.run_check(configuration, sources, jobs, every=every, file=output,
+                                                 errors=errors), 2)
+                self.assertEqual(output.getvalue().count('index.html:1:'), count)
+                self.assertEqual(output.getvalue().count(": ' '\n"), count if every else 0)
+                self.assertIn('broken.html', errors.getvalue())
+        batch.run(configuration, batch.collect([self.input], self.output), 1, file=StringIO())
+        clean = [source for source, destination in batch.collect([self.output]) if 'broken' not in source]
+        self.assertEqual(batch.run_check(configuration, clean, file=StringIO()), 0)
+        with self.assertRaises(SystemExit) as cm:
+            main(['--check', sources[0]])
+        self.assertEqual(cm.exception.code, 1)
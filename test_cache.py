@@ -0,0 +1,57 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import TestCase
+
+import cs
+import en
+import transducer
+from cache import TransductionCache
+
+assert cs
+assert en
+
+
+class TestTransductionCache(TestCase):
+    def test_lru(self):
+        cache = TransductionCache(2)
+        cache.put('a', 'A')
+        cache.put('b', 'B')
+        self.assertEqual(cache.get('a'), 'A')
+        cache.put('c', 'C')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 'C')
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache')
+            cache = TransductionCache(1, path)
+            cache.put(cache.key('f', 'k mostu'), 'k&nbsp;mostu')
+            cache.put(cache.key('f', 'v\udc80'), 'v')
+            cache.close()
+            cache = TransductionCache(1, path)
+            self.assertEqual(cache.get(cache.key('f', 'k mostu')), 'k&nbsp;mostu')
+            self.assertIsNone(cache.get(cache.key('g', 'k mostu')))
+            cache.close()
+
+    def test_master(self):
+        master = transducer.master
+        master.select(master.transducers.keys())
+        html = open('test/prirucka-nonbsp.html', encoding='utf_8').read() * 3
+        expected = master.transduce_html(html)
+        master.cache = TransductionCache()
+        try:
+            self.assertEqual(master.transduce_html(html), expected)
+            self.assertGreater(master.cache.hits, 0)
+            misses = master.cache.misses
+            self.assertEqual(master.transduce_html(html), expected)
+            self.assertEqual(master.cache.misses, misses)
+            output = StringIO()
+            master.write_html(html, output)
+            self.assertEqual(output.getvalue(), expected)
+            fingerprint = master.fingerprint()
+            master.select(['cs.ksvz'])
+            self.assertNotEqual(master.fingerprint(), fingerprint)
+        finally:
+            master.cache = None
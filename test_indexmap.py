@@ -0,0 +1,73 @@
+import random
+from unittest import TestCase
+
+from indexmap import IndexMap
+
+
+class TestIndexMap(TestCase):
+    @staticmethod
+    def replace_list(indices, replacements):
+        result = []
+        i = 0
+        for start, end, length, pretend in replacements:
+            result.extend(indices[i:start])
+            result.extend([indices[pretend]] * length)
+            i = end
+        result.extend(indices[i:])
+        return result
+
+    @staticmethod
+    def random_replacements(rng, n):
+        replacements = []
+        i = 0
+        while i < n and rng.random() < 0.8:
+            start = rng.randrange(i, n)
+            end = rng.randrange(start + 1, min(n, start + 4) + 1)
+            replacements.append((start, end, rng.randrange(0, 7), rng.choice([start, end - 1])))
+            i = end
+        return replacements
+
+    def test_identity(self):
+        self.assertEqual(list(IndexMap.identity(5)), [0, 1, 2, 3, 4])
+        self.assertEqual(list(IndexMap.identity(0)), [])
+
+    def test_concatenate(self):
+        first = IndexMap.identity(3).replace([(1, 2, 6, 1)])
+        second = IndexMap.identity(4)
+        concatenated = IndexMap.concatenate([first, second], [0, 3])
+        self.assertEqual(list(concatenated), list(first) + [3, 4, 5, 6])
+        self.assertEqual(concatenated, IndexMap.identity(7).replace([(1, 2, 6, 1)]))
+        self.assertTrue(IndexMap.concatenate([IndexMap.identity(2), second], [0, 2]).is_identity())
+        self.assertFalse(first.is_identity())
+
+    def test_replace(self):
+        index_map = IndexMap.identity(7).replace([(1, 2, 6, 1)])
+        self.assertEqual(list(index_map), [0, 1, 1, 1, 1, 1, 1, 2, 3, 4, 5, 6])
+        self.assertEqual(index_map[4], 1)
+        self.assertEqual(list(index_map.positions([0, 1, 2, 7])), [0, 1, 7, 12])
+
+    def test_compose_random(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            n = rng.randrange(1, 30)
+            index_map = IndexMap.identity(n)
+            indices = list(range(n))
+            for _ in range(3):
+                if len(indices) == 0:
+                    break
+                replacements = self.random_replacements(rng, len(indices))
+                index_map = index_map.replace(replacements)
+                indices = self.replace_list(indices, replacements)
+                self.assertEqual(list(index_map), indices)
+                self.assertEqual(len(index_map), len(indices))
+            expected = [next((j for j, index in enumerate(indices) if index >= i), len(indices)) for i in range(n + 1)]
+            self.assertEqual(list(index_map.positions(range(n + 1))), expected)
+
+    def test_from_sequence(self):
+        for indices in [[], [3], [0, 1, 2], [0, 0, 0, 1, 2, 2], [0, 1, 2, 2, 2, 3, 5, 6, 6], range(2, 9)]:
+            index_map = IndexMap.from_sequence(indices)
+            self.assertEqual(list(index_map), list(indices))
+            self.assertEqual(len(index_map), len(indices))
+        self.assertEqual(IndexMap.from_sequence(range(5)), IndexMap.identity(5))
+        index_map = IndexMap.identity(3)
+        self.assertIs(IndexMap.of(index_map), index_map)
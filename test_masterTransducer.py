@@ -7,7 +7,8 @@ from unittest import TestCase, skip
 import cs
 import en
 import transducer
-from transducer import Transducer
+from indexmap import IndexMap
+from transducer import Transducer, MasterTransducer, ReTransducer
 
 assert cs
 assert en
@@ -15,19 +16,23 @@ assert en
 
 class TestMasterTransducer(TestCase):
     @staticmethod
-    def configure_master(transducers=[], groups=[]):
+    def configure_master(transducers=[], groups=[], fused=False, master=transducer.master, backend='auto',
+                         nbsp='entity'):
         namespace = Namespace()
         setattr(namespace, 'help', False)
         setattr(namespace, 'group', groups)
         setattr(namespace, 'transducer', transducers)
-        transducer.master.configure(namespace)
+        setattr(namespace, 'fused', fused)
+        setattr(namespace, 'backend', backend)
+        setattr(namespace, 'nbsp', nbsp)
+        master.configure(namespace)
 
     @staticmethod
-    def transduce(transducer, string):
+    def transduce(transducer, string, chunk_size=None):
         assert isinstance(transducer, Transducer)
         infile = StringIO(string)
         outfile = StringIO()
-        transducer.process_file(infile, outfile)
+        transducer.process_file(infile, outfile, chunk_size)
         outfile.seek(0)
         return outfile.getvalue()
 
@@ -42,6 +47,206 @@ class TestMasterTransducer(TestCase):
         cases = json.load(open('test_masterTransducer_cs.json'))
         self.transduce_assert(transducer.master, cases)
 
+    def test_cs_fused(self):
+        self.configure_master(groups=[['cs']], fused=True)
+        self.assertLess(len(transducer.master.pipeline()), len(transducer.master.selected))
+        cases = json.load(open('test_masterTransducer_cs.json'))
+        self.transduce_assert(transducer.master, cases)
+
+    def test_fused_dependency(self):
+        master = MasterTransducer()
+        master.add(ReTransducer(r'a', {0: 'b'}, name='a'), [])
+        master.add(ReTransducer(r'b(b)', {1: 'c'}, name='bb'), [])
+        self.configure_master(fused=True, master=master)
+        self.transduce_assert(master, [('xab <i>a</i>b', 'xbc <i>b</i>c')])
+
+    def test_fixpoint_overlapping(self):
+        t = ReTransducer(r'\d( )\d', {1: '_'})
+        padding = 'x ' * 5000
+        string = '1 2 3 4' + padding + '5 <b>6</b> 7'
+        self.assertEqual(self.transduce(t, string), '1_2_3_4' + padding + '5_<b>6</b>_7')
+        self.assertEqual(t.substitute_once(string, IndexMap.identity(len(string)))[0][:7], '1_2 3_4')
+
+    def test_lookahead(self):
+        thousands = transducer.master.transducers['thousands_separator']
+        self.assertFalse(thousands.fixpoint)
+        with self.assertRaises(AttributeError):
+            thousands.fixpoint = True
+        self.assertEqual(thousands.substitute_once('1 000 000 0000', range(14))[0], '1\xa0000\xa0000 0000')
+        ratio = transducer.master.transducers['ratio']
+        self.assertTrue(ratio.fixpoint)
+        self.assertEqual(ratio.pattern, r'\d( ):( )\d')
+
+    def test_lazy_compile(self):
+        t = ReTransducer(r'\d( )\d', {1: '_'})
+        self.assertIsNone(t._regex)
+        self.assertEqual(t.reach, 4)
+        self.assertEqual(t.regex.pattern, r'\d( )\d')
+
+    def test_substitute_sequence(self):
+        t = ReTransducer(r'\b(a)\b', {1: 'bcd'})
+        string, indices = t.substitute('x a y', range(5))
+        self.assertEqual(string, 'x bcd y')
+        self.assertEqual(list(indices), [0, 1, 2, 2, 2, 3, 4])
+        string, indices = t.substitute('x a y', [0, 1, 1, 2, 3])
+        self.assertEqual(list(indices), [0, 1, 1, 1, 1, 2, 3])
+
+    def test_stream(self):
+        self.configure_master()
+        self.assertTrue(transducer.master.is_separator('\n'))
+        html = open('test/prirucka-nonbsp.html', encoding='utf_8').read()
+        expected = self.transduce(transducer.master, html)
+        for chunk_size in [1, 100, 10000]:
+            self.assertEqual(self.transduce(transducer.master, html, chunk_size), expected)
+        t = ReTransducer(r'a(\s)b', {1: '_'})
+        self.assertFalse(t.is_separator('\n'))
+        self.assertEqual(self.transduce(t, 'a\nb', 1), 'a_b')
+
+    def test_opaque(self):
+        self.configure_master(groups=[['cs']])
+        html = '<pre>\nk mostu\n</pre>\nk mostu\n<script>\nk = a + 1;\n</script>\n'
+        expected = html.replace('</pre>\nk mostu', '</pre>\nk&nbsp;mostu')
+        for chunk_size in [None, 1]:
+            self.assertEqual(self.transduce(transducer.master, html, chunk_size), expected)
+        for html in ['Cena 100<script>var x;</script> Kč', 'v<style>p{}</style> lese', '\ufffc<pre></pre> Kč']:
+            self.assertEqual(self.transduce(transducer.master, html), html)
+            self.assertEqual(list(transducer.master.check_html(html)), [])
+            self.assertEqual(list(transducer.master.transduce_many([html, html])), [html, html])
+        master = MasterTransducer()
+        master.add(ReTransducer(r'\d(\W)K', {1: '&nbsp;'}, name='d_k'), [])
+        self.configure_master(master=master)
+        self.assertFalse(master.is_separator('\ufffc'))
+        html = '1<pre>x</pre>K 1 K'
+        self.assertEqual(master.transduce_html(html), '1<pre>x</pre>K 1&nbsp;K')
+        self.assertEqual([html[start:end] for start, end, _name in master.check_html(html)], [' '])
+        self.configure_master()
+
+    def test_write_html(self):
+        self.configure_master()
+        html = '<p>k <b>mostu</b> a 1 000</p>'
+        output = StringIO()
+        transducer.master.write_html(html, output)
+        self.assertEqual(output.getvalue(), transducer.master.transduce_html(html))
+
+    def test_transduce_many(self):
+        self.configure_master()
+        master = transducer.master
+        snippets = [case[0] for case in json.load(open('test_masterTransducer_cs.json'))]
+        snippets += ['', '<b>k</b> mostu', 'a\n<i>1 000</i>', 'v<br>', '<p>z lesa', 's']
+        expected = [master.transduce_html(snippet) for snippet in snippets]
+        for batch_size in [1, 7, 1000]:
+            self.assertEqual(list(master.transduce_many(iter(snippets), batch_size)), expected)
+        t = ReTransducer(r'a(\s)b', {1: '_'})
+        self.assertEqual(list(t.transduce_many(['a\nb', 'a b'])), ['a_b', 'a_b'])
+
+    def test_mapped(self):
+        self.configure_master()
+        path = 'test/prirucka-nonbsp.html'
+        expected = self.transduce(transducer.master, open(path, encoding='utf_8').read())
+        for chunk_size in [None, 1000]:
+            outfile = StringIO()
+            transducer.master.process_mapped(path, outfile, 'utf_8', chunk_size)
+            self.assertEqual(outfile.getvalue(), expected)
+
+    def test_statistics(self):
+        master = transducer.master
+        self.configure_master(transducers=[['cs.ksvz', 'thousands_separator']], groups=[['en']])
+        master.collect_statistics()
+        try:
+            master.transduce_html('k mostu a <b>1 000</b> 000 z lesa')
+            report = master.statistics_report()
+            self.assertEqual(report['transducers']['cs.ksvz']['matches'], 2)
+            self.assertEqual(report['transducers']['thousands_separator']['matches'], 2)
+            self.assertEqual(report['transducers']['thousands_separator']['sweeps'], 1)
+            self.assertEqual(report['groups']['cs']['matches'], 4)
+            self.assertEqual(report['groups']['en']['matches'], 0)
+            self.assertEqual(report['groups']['en']['sweeps'], 0)
+            self.assertGreater(report['groups']['en']['skips'], 0)
+            self.assertNotIn('cs.strana', report['groups'])
+            taken = master.take_statistics()
+            self.assertEqual(len(master.statistics), 0)
+            master.merge_statistics(taken)
+            master.merge_statistics(taken)
+            self.assertEqual(master.statistics_report()['transducers']['cs.ksvz']['matches'], 4)
+            output = StringIO()
+            master.print_statistics(output, 'json')
+            self.assertEqual(json.loads(output.getvalue()), master.statistics_report())
+        finally:
+            master.collect_statistics(False)
+
+    def test_may_match(self):
+        currency = transducer.master.transducers['cs.currency']
+        self.assertTrue(currency.may_match('100 Kč'))
+        self.assertFalse(currency.may_match('100 korun'))
+        declared = transducer.ReTransducer(r'\w( )\w', {1: '&nbsp;'}, required=['x'])
+        self.assertFalse(declared.may_match('a b'))
+        self.assertTrue(transducer.ReTransducer(r'\w( )?', {1: '&nbsp;'}).may_match('ab'))
+        scoped = transducer.ReTransducer(r'a(?i:kč)( )b', {1: '&nbsp;'})
+        self.assertEqual(scoped.substitute_once('aKČ b', range(5))[0], 'aKČ\xa0b')
+        self.assertTrue(scoped.may_match('aKČ b'))
+
+    def test_backends(self):
+        cases = json.load(open('test_masterTransducer_cs.json'))
+        html = open('test/prirucka-nonbsp.html', encoding='utf_8').read()
+        outputs = []
+        try:
+            for backend in ReTransducer.Backend:
+                self.configure_master(groups=[['cs']], backend=backend.value)
+                self.transduce_assert(transducer.master, cases)
+                self.configure_master(backend=backend.value)
+                outputs.append(transducer.master.transduce_html(html))
+        finally:
+            self.configure_master()
+        self.assertEqual(outputs[1:], outputs[:-1])
+        currency = transducer.master.transducers['cs.currency']
+        content = 'x' * 1000 + '100 Kč'
+        self.assertEqual(currency.literal_windows(content), [(997, 1006)])
+        self.assertIsNone(currency.literal_windows('100 Kč'))
+        master = MasterTransducer()
+        master.add(ReTransducer(r'a( )b', {1: '&nbsp;'}, name='a_b'), [])
+        self.configure_master(master=master, backend='literal')
+        self.assertIs(master.transducers['a_b'].backend, ReTransducer.Backend.literal)
+        self.assertIs(transducer.master.transducers['cs.ksvz'].backend, ReTransducer.Backend.auto)
+
+    def test_check(self):
+        self.configure_master()
+        master = transducer.master
+        html = '<p>hotovo</p>\n<p>k <b>mostu</b> a 1 000 Kč</p>'
+        self.assertEqual([(html[start:end], name) for start, end, name in master.check_html(html)],
+                         [(' ', 'cs.ksvz'), (' ', 'cs.ai'), (' ', 'thousands_separator'), (' ', 'cs.currency')])
+        self.assertEqual(next(master.check_file(StringIO(html), 4)), (2, 5, ' ', 'cs.ksvz'))
+        self.assertEqual(list(master.check_file(StringIO(master.transduce_html(html)))), [])
+        for input, expected in json.load(open('test_masterTransducer_cs.json')):
+            self.assertEqual(any(master.check_html(input)), master.transduce_html(input) != input, input)
+        group = cs.lang_cs
+        self.assertEqual(next(Transducer.changes(group, 'a k mostu'))[:2], (1, 4))
+
+    def test_nbsp(self):
+        html = '<p>k <b>mostu</b>, ČSN 01&nbsp;6910 a\xa0ČSN 02\xa01234</p>'
+        outputs = {}
+        try:
+            for form in Transducer.Nbsp:
+                self.configure_master(nbsp=form.name)
+                outputs[form.name] = transducer.master.transduce_html(html)
+                self.assertEqual(list(transducer.master.transduce_many([html, html])), [outputs[form.name]] * 2)
+        finally:
+            self.configure_master()
+        self.assertEqual(outputs['entity'],
+                         '<p>k&nbsp;<b>mostu</b>, ČSN&nbsp;01&nbsp;6910 a\xa0ČSN&nbsp;02\xa01234</p>')
+        self.assertEqual(outputs['numeric'],
+                         '<p>k&#160;<b>mostu</b>, ČSN&#160;01&nbsp;6910 a\xa0ČSN&#160;02\xa01234</p>')
+        self.assertEqual(outputs['raw'], '<p>k\xa0<b>mostu</b>, ČSN\xa001&nbsp;6910 a\xa0ČSN\xa002\xa01234</p>')
+        self.assertEqual([html[start:end] for start, end, _name in transducer.master.check_html(html)], [' '] * 3)
+        master = MasterTransducer()
+        master.add(ReTransducer(r'a( )b', {1: '&nbsp;'}, name='a_b'), [])
+        self.configure_master(master=master, nbsp='raw')
+        self.assertEqual(master.transduce_html('a b'), 'a\xa0b')
+        self.assertEqual(transducer.master.transduce_html('k mostu'), 'k&nbsp;mostu')
+        content = 'k mostu, 1 000 Kč'
+        string, indices = transducer.master.substitute(content, IndexMap.identity(len(content)))
+        self.assertEqual(string, 'k\xa0mostu, 1\xa0000\xa0Kč')
+        self.assertTrue(indices.is_identity())
+
     def test_cs_group(self):
         cases = json.load(open('test_masterTransducer_cs.json'))
         self.transduce_assert(cs.lang_cs, cases)
@@ -0,0 +1,36 @@
+from io import StringIO
+from unittest import TestCase
+
+import cs
+import en
+import memory
+import transducer
+
+assert cs
+assert en
+
+
+class TestMemory(TestCase):
+    def test_report(self):
+        master = transducer.master
+        master.select(['cs.ksvz', 'thousands_separator'])
+        html = open('test/prirucka-nonbsp.html', encoding='utf_8').read()
+        expected = master.transduce_html(html)
+        master.memory = memory.MemoryReport()
+        master.memory.start()
+        try:
+            self.assertEqual(master.transduce_html(html), expected)
+        finally:
+            master.memory.stop()
+            report, master.memory = master.memory, None
+        self.assertEqual(list(report.peaks.keys()), ['tokenize', 'cs.ksvz', 'thousands_separator', 'splice'])
+        self.assertGreater(report.peaks['tokenize'], len(html))
+        self.assertGreaterEqual(report.peak, max(report.peaks.values()))
+        output = StringIO()
+        report.print_report(output)
+        self.assertIn('cs.ksvz', output.getvalue())
+
+    def test_chunk_size(self):
+        budget = 2 ** 20
+        self.assertLessEqual(2 * memory.estimate(memory.chunk_size(budget)), budget)
+        self.assertEqual(memory.chunk_size(1), memory.min_chunk_size)
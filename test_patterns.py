@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+import cs
+import en
+import patterns
+import transducer
+from transducer import MasterTransducer
+
+assert cs
+assert en
+
+
+class TestPatterns(TestCase):
+    definitions = {
+        'groups': {'titles': 'Academic titles'},
+        'transducers': [
+            {'name': 'titles.dr', 'words': [r'\bDr\.', r'\w'], 'groups': ['titles'], 'examples': ['Dr. Novák']},
+            {'name': 'titles.ing', 'dotted': ['Ing', 'arch'], 'groups': ['titles']},
+            {'name': 'titles.phd', 'pattern': r',( )Ph\.D\.', 'replacement': {'1': '&nbsp;'}, 'align': 'right',
+             'fixpoint': False},
+        ],
+    }
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, definitions):
+        path = os.path.join(self.directory.name, 'patterns.json')
+        with open(path, 'w', encoding='utf_8') as f:
+            json.dump(definitions, f)
+        return path
+
+    def test_register(self):
+        master = MasterTransducer()
+        path = self.write(self.definitions)
+        patterns.register(path, master)
+        patterns.register(path, master)
+        self.assertEqual(list(master.transducers), ['titles.dr', 'titles.ing', 'titles.phd'])
+        self.assertEqual([t.name for t in master.groups['titles'].transducers], ['titles.dr', 'titles.ing'])
+        self.assertEqual(master.transducers['titles.phd'].align, transducer.ReTransducer.Align.right)
+        master.select(master.transducers)
+        self.assertEqual(master.transduce_html('Dr. Novák, Ph.D. a Ing. arch. Nováková'),
+                         'Dr.&nbsp;Novák,&nbsp;Ph.D. a Ing.&nbsp;arch. Nováková')
+
+    def test_invalid(self):
+        master = MasterTransducer()
+        master.add_group('cs')
+        invalid = [
+            [],
+            {'rules': []},
+            {'groups': {'cs': None}},
+            {'transducers': [{'words': ['a', 'b']}]},
+            {'transducers': [{'name': 'x', 'words': ['a', 'b'], 'pattern': 'a'}]},
+            {'transducers': [{'name': 'x', 'words': ['a']}]},
+            {'transducers': [{'name': 'x', 'words': ['(', 'b']}]},
+            {'transducers': [{'name': 'x', 'words': ['a', 'b'], 'group': ['cs']}]},
+            {'transducers': [{'name': 'x', 'words': ['a', 'b'], 'groups': ['xx']}]},
+            {'transducers': [{'name': 'x', 'pattern': 'a( )b', 'replacement': {'2': '&nbsp;'}}]},
+            {'transducers': [{'name': 'x', 'pattern': 'a( )b', 'replacement': {'1': '&nbsp;'}, 'align': 'up'}]},
+            {'transducers': [{'name': 'x', 'pattern': 'a( )b', 'replacement': {'1': 5}}]},
+            {'transducers': [{'name': 'x', 'pattern': 'a( )b', 'replacement': {'1': '&nbsp;'}, 'fixpoint': 'false'}]},
+            {'transducers': [{'name': 'x', 'words': ['a', 'b']}, {'name': 'x', 'words': ['a', 'b']}]},
+        ]
+        for definitions in invalid:
+            with self.assertRaises(ValueError, msg=definitions):
+                patterns.load(self.write(definitions), master)
+        self.assertEqual(list(master.transducers), [])
+        with open(os.path.join(self.directory.name, 'patterns.json'), 'w') as f:
+            f.write('{')
+        with self.assertRaises(ValueError):
+            patterns.load(f.name, master)
@@ -0,0 +1,54 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import batch
+import cs
+import en
+import profiles
+import transducer
+from transducer import MasterTransducer
+
+assert cs
+assert en
+
+
+class TestProfiles(TestCase):
+    def test_load(self):
+        html = open('test/prirucka-nonbsp.html', encoding='utf_8').read()
+        master = transducer.master
+        master.select(master.transducers.keys(), True)
+        expected = master.transduce_html(html)
+        analyses = profiles.analyses(master)
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertFalse(profiles.load(directory, master, ['cs', 'en']))
+            self.assertEqual(os.listdir(directory), [profiles.key(master, ['cs', 'en']) + '.json'])
+            # A fresh master with the same transducers takes the analyses from the profile.
+            fresh = MasterTransducer()
+            for t in master.transducers.values():
+                copy = transducer.WordsNbspSubstituter(t.words, t.name) if hasattr(t, 'words') else t
+                fresh.add(copy, [])
+            fresh.select(master.transducers.keys(), True)
+            self.assertTrue(profiles.load(directory, fresh, ['cs', 'en']))
+            ksvz = fresh.transducers['cs.ksvz']
+            self.assertTrue(ksvz._fusable)
+            self.assertIsNot(ksvz._reach, transducer._unknown)
+            self.assertEqual(profiles.analyses(fresh), analyses)
+            self.assertEqual(fresh.transduce_html(html), expected)
+            fresh.select(['cs.ksvz'])
+            self.assertNotEqual(profiles.key(fresh, ['cs', 'en']), profiles.key(master, ['cs', 'en']))
+
+    def test_configure(self):
+        master = transducer.master
+        master.select(['cs.ksvz', 'thousands_separator'])
+        with tempfile.TemporaryDirectory() as directory:
+            master.profile_cache = directory
+            configuration = batch.capture(master, ['cs', 'en'])
+            master.profile_cache = None
+            try:
+                # A worker loads the profile, or saves it if there is none.
+                batch.configure(configuration)
+                self.assertEqual(master.profile_cache, directory)
+                self.assertEqual(os.listdir(directory), [profiles.key(master, ['cs', 'en']) + '.json'])
+            finally:
+                master.profile_cache = None
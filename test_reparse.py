@@ -0,0 +1,69 @@
+import re
+from unittest import TestCase
+
+import reparse
+
+
+class TestReparse(TestCase):
+    def reach(self, pattern):
+        return reparse.reach(re.compile(pattern))
+
+    def embeddable(self, pattern):
+        return reparse.is_embeddable(re.compile(pattern))
+
+    def test_reach(self):
+        self.assertEqual(self.reach(r'ab( )c'), 5)
+        self.assertEqual(self.reach(r'\d{1,3}( )\d{3}'), 8)
+        self.assertEqual(self.reach(r'\bk( )\w\b'), 4)
+        self.assertEqual(self.reach(r'(?<=ab)c(?=de)'), 6)
+        self.assertEqual(self.reach(r'(?<!x)c'), 3)
+
+    def test_reach_unbounded(self):
+        self.assertIsNone(self.reach(r'a+'))
+        self.assertIsNone(self.reach(r'a( )b*'))
+        self.assertIsNone(self.reach(r'c(?=d+)'))
+
+    def test_embeddable(self):
+        self.assertTrue(self.embeddable(r'\b[ks]( )\w'))
+        self.assertFalse(self.embeddable(r'(?P<a>x)'))
+        self.assertFalse(self.embeddable(r'(a)\1'))
+        self.assertFalse(self.embeddable(r'(a)?(?(1)b|c)'))
+        self.assertFalse(self.embeddable(r'(?i)x'))
+        self.assertFalse(self.embeddable(r'(?x) x '))
+
+    def test_can_match(self):
+        self.assertFalse(reparse.can_match(re.compile(r'\b[ks]'), ' &;'))
+        self.assertFalse(reparse.can_match(re.compile(r'\d{1,3}'), ' &;'))
+        self.assertTrue(reparse.can_match(re.compile(r'\W'), ' '))
+        self.assertTrue(reparse.can_match(re.compile(r'a.'), ';'))
+        self.assertTrue(reparse.can_match(re.compile(r'[^x]'), '&'))
+        self.assertTrue(reparse.can_match(re.compile(r'(?i)K'), ' '))
+        self.assertTrue(reparse.can_match(re.compile(r'a(?i:k)'), 'K'))
+
+    def test_group_language(self):
+        self.assertEqual(reparse.group_language(re.compile(r'a( |&nbsp;)b'), 1), {' ', '&nbsp;'})
+        self.assertEqual(reparse.group_language(re.compile(r'x(y|z)'), 0), {'xy', 'xz'})
+        self.assertIsNone(reparse.group_language(re.compile(r'a(\s)b'), 1))
+        self.assertIsNone(reparse.group_language(re.compile(r'(?i)a( )b'), 1))
+        self.assertIsNone(reparse.group_language(re.compile(r'(?i:a( )b)'), 1))
+
+    def test_required(self):
+        self.assertEqual(reparse.required(re.compile(r'\b[ks]( )\w')), {'k ', 's '})
+        self.assertEqual(reparse.required(re.compile(r'\d( )(?:Kč|€)\b')), {' Kč', ' €'})
+        self.assertEqual(reparse.required(re.compile(r'(?:\d+ab)+\d')), {'ab'})
+        self.assertEqual(reparse.required(re.compile(r'\d+(?= )')), {' '})
+        self.assertEqual(reparse.required(re.compile(r'\d(?= %)( )')), {' %'})
+        self.assertIsNone(reparse.required(re.compile(r'\d+(?<= )')))
+        self.assertIsNone(reparse.required(re.compile(r'x?')))
+        self.assertIsNone(reparse.required(re.compile(r'(?i)abc')))
+        self.assertEqual(reparse.required(re.compile(r'a(?i:kč)( )b')), {' b'})
+        self.assertIsNone(reparse.required(re.compile(r'(?i:kč)')))
+
+    def test_separates(self):
+        self.assertTrue(reparse.separates(re.compile(r'\b[ks]( )\w'), '\n'))
+        self.assertTrue(reparse.separates(re.compile(r'(?<!\d)x(?=y)'), '\n'))
+        self.assertFalse(reparse.separates(re.compile(r'\s'), '\n'))
+        self.assertFalse(reparse.separates(re.compile(r'(?<!\n)x'), '\n'))
+        self.assertFalse(reparse.separates(re.compile(r'^x'), '\n'))
+        self.assertFalse(reparse.separates(re.compile(r'x?'), '\n'))
+        self.assertFalse(reparse.separates(re.compile(r'\bx'), 'y'))
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import socket
+import tempfile
+from io import StringIO
+from unittest import TestCase, skipUnless
+
+import cs
+import en
+import server
+import transducer
+
+assert cs
+assert en
+
+
+class TestServer(TestCase):
+    def setUp(self):
+        transducer.master.select(transducer.master.transducers.keys())
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def exchange(self, jobs, address, requests):
+        """
+        Starts a server, sends the requests over a single connection and returns the responses by their ids.
+        """
+        instance = server.Server(transducer.master, ['cs', 'en'], jobs)
+
+        async def client():
+            listener = await instance.start(address)
+            try:
+                if isinstance(server.parse_address(address), tuple):
+                    host, port = listener.sockets[0].getsockname()[:2]
+                    reader, writer = await asyncio.open_connection(host, port)
+                else:
+                    reader, writer = await asyncio.open_unix_connection(address)
+                for request in requests:
+                    writer.write(request if isinstance(request, bytes) else json.dumps(request).encode('utf_8'))
+                    writer.write(b'\n')
+                writer.write_eof()
+                responses = {}
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    response = json.loads(line.decode('utf_8'))
+                    responses[response['id']] = response
+                writer.close()
+                return responses
+            finally:
+                listener.close()
+                await listener.wait_closed()
+
+        try:
+            return self.loop.run_until_complete(client()), instance
+        finally:
+            instance.close()
+
+    def test_serve(self):
+        html = '<p>k mostu a 1 000 Kč</p>'
+        requests = [
+            {'id': 1, 'html': html},
+            {'id': 2, 'html': html, 'transducers': ['cs.ksvz']},
+            {'id': 3, 'html': html, 'groups': ['cs'], 'fused': True},
+            {'id': 4, 'html': html, 'groups': ['xx']},
+            {'id': 5},
+            b'not json',
+        ]
+        for jobs in [1, 2]:
+            responses, instance = self.exchange(jobs, '127.0.0.1:0', requests)
+            self.assertEqual(responses[1]['html'], transducer.master.transduce_html(html))
+            self.assertEqual(responses[2]['html'], '<p>k&nbsp;mostu a 1 000 Kč</p>')
+            self.assertEqual(responses[3]['html'], responses[1]['html'])
+            self.assertIn('xx', responses[4]['error'])
+            self.assertIn('error', responses[5])
+            self.assertIn('error', responses[None])
+            self.assertGreaterEqual(responses[1]['latency'], responses[1]['seconds'])
+            report = instance.report()
+            self.assertEqual((report['requests'], report['errors']), (6, 3))
+            output = StringIO()
+            instance.print_report(output)
+            self.assertIn('6', output.getvalue())
+
+    @skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets are not supported')
+    def test_serve_unix(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'nbspacer.sock')
+            responses, _instance = self.exchange(1, path, [{'id': 'a', 'html': 'k mostu'}])
+        self.assertEqual(responses['a']['html'], 'k&nbsp;mostu')
+
+    def test_parse_address(self):
+        self.assertEqual(server.parse_address('8080'), ('localhost', 8080))
+        self.assertEqual(server.parse_address('127.0.0.1:8080'), ('127.0.0.1', 8080))
+        self.assertEqual(server.parse_address('/tmp/nbspacer.sock'), '/tmp/nbspacer.sock')
@@ -0,0 +1,48 @@
+import json
+from unittest import TestCase
+
+import cs
+import en
+import shards
+import transducer
+from indexmap import IndexMap
+
+assert cs
+assert en
+
+
+class TestShards(TestCase):
+    def test_split(self):
+        string = 'ab\ncd\n\nefgh'
+        spans = shards.split(string, 2)
+        self.assertEqual([string[start:end] for start, end in spans], ['ab\n', 'cd\n', '\nefgh'])
+        self.assertEqual(shards.split('abcdef', 2), [(0, 6)])
+        self.assertEqual(shards.split('', 2), [(0, 0)])
+
+    def test_shard_pool(self):
+        master = transducer.master
+        master.select(master.transducers.keys())
+        html = open('test/prirucka-nonbsp.html', encoding='utf_8').read()
+        html += ''.join(case[0] + '\n' for case in json.load(open('test_masterTransducer_cs.json')))
+        expected = master.transduce_html(html)
+        master.collect_statistics()
+        pool = shards.ShardPool(master, ['cs', 'en'], 2)
+        pool.shard_size = 1000
+        master.shard_pool = pool
+        try:
+            self.assertEqual(master.transduce_html(html), expected)
+            self.assertTrue(pool._executor is not None)
+            self.assertGreater(master.statistics_report()['transducers']['cs.ksvz']['matches'], 0)
+        finally:
+            master.shard_pool = None
+            master.collect_statistics(False)
+            pool.close()
+
+    def test_not_separated(self):
+        master = transducer.MasterTransducer()
+        master.add(transducer.ReTransducer(r'a(\s)b', {1: '&nbsp;'}, name='a_b'), [])
+        master.select(['a_b'])
+        pool = shards.ShardPool(master, [], 2)
+        pool.shard_size = 10
+        self.assertIsNone(pool.substitute('a\nb\n' * 100, IndexMap.identity(400)))
+        self.assertIsNone(pool._executor)
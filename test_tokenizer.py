@@ -0,0 +1,73 @@
+import io
+from unittest import TestCase
+
+from indexmap import IndexMap
+from tokenizer import tokenize, splice, cut, pieces, is_ascii_compatible, blocks, locate
+
+
+class TestTokenizer(TestCase):
+    def test_tokenize(self):
+        html = 'k <i><b>mostu</b></i> a > b <img src="data:image/png;base64,AAAA"'
+        content, tags = tokenize(html)
+        self.assertEqual(content, 'k mostu a  b ')
+        self.assertEqual([(index, html[start:end]) for index, start, end in tags],
+                         [(2, '<i><b>'), (7, '</b></i>'), (10, '>'), (13, '<img src="data:image/png;base64,AAAA"')])
+
+    def test_tokenize_opaque(self):
+        html = ('k <PRE class="x">s  b</pre >a<!-- <b> v lese -->z <script>if (a<b) {}</script>'
+                '<style>p > b {}</style>o <pre>u')
+        content, tags = tokenize(html)
+        self.assertEqual(content, 'k \ufffcaz \ufffco \ufffc')
+        self.assertEqual([html[start:end] for index, start, end in tags],
+                         ['<PRE class="x">s  b</pre >', '<!-- <b> v lese -->',
+                          '<script>if (a<b) {}</script><style>p > b {}</style>', '<pre>u'])
+        self.assertEqual(tokenize(html.encode('utf_8'), 'utf_8'), (content, tags))
+        self.assertEqual(tokenize('<prefix>k')[0], 'k')
+        self.assertEqual(''.join(splice(html, tags, content, IndexMap.identity(len(content)))), html)
+
+    def test_tokenize_bytes(self):
+        html = 'č <i>ř</i> ž'
+        data = html.encode('utf_8')
+        content, tags = tokenize(data, 'utf_8')
+        self.assertEqual((content, [index for index, start, end in tags]), tokenize(html)[0:1] + ([2, 3],))
+        self.assertEqual([data[start:end] for index, start, end in tags], [b'<i>', b'</i>'])
+        indices = IndexMap.identity(len(content))
+        self.assertEqual(''.join(splice(data, tags, content, indices, 'utf_8')), html)
+        self.assertFalse(is_ascii_compatible('utf_16'))
+        self.assertTrue(is_ascii_compatible('cp1250'))
+
+    def test_splice(self):
+        html = '<p>k <b>mostu</b></p>'
+        content, tags = tokenize(html)
+        indices = IndexMap.identity(len(content)).replace([(1, 2, 6, 1)])
+        self.assertEqual(''.join(splice(html, tags, 'k&nbsp;mostu', indices)), '<p>k&nbsp;<b>mostu</b></p>')
+
+    def test_locate(self):
+        html = '<p>k <b>mostu</b></p> a'
+        content, tags = tokenize(html)
+        self.assertEqual([html[locate(tags, index)] for index in range(len(content))], list(content))
+
+    def test_cut(self):
+        self.assertEqual(cut('a\nb <i>c\nd</i> e'), 9)
+        self.assertEqual(cut('a\nb <i\nc>'), 2)
+        self.assertEqual(cut('a\nb <i\nc'), 2)
+        self.assertEqual(cut('a\nb\n<i>'), 4)
+        self.assertEqual(cut('a b'), 0)
+
+    def test_pieces(self):
+        html = open('test/prirucka-nonbsp.html', encoding='utf_8').read()
+        for chunk_size in [1, 10, 1000]:
+            result = list(pieces(io.StringIO(html), chunk_size))
+            self.assertEqual(''.join(result), html)
+            for piece in result[:-1]:
+                content, tags = tokenize(piece)
+                self.assertTrue(content.endswith('\n'))
+
+    def test_blocks(self):
+        html = open('test/prirucka-nonbsp.html', encoding='utf_8').read()
+        result = list(blocks(html * 2))
+        self.assertEqual(''.join(result), html * 2)
+        self.assertLess(len(set(result)), len(result))
+        for block in result[:-1]:
+            self.assertTrue(tokenize(block)[0].endswith('\n'))
+        self.assertEqual(list(blocks('a <b\nc> d')), ['a <b\nc> d'])
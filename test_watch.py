@@ -0,0 +1,91 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import TestCase
+
+import cs
+import en
+import transducer
+import watch
+
+assert cs
+assert en
+
+
+class TestWatch(TestCase):
+    def setUp(self):
+        transducer.master.select(transducer.master.transducers.keys())
+        self.directory = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.directory.name, 'input')
+        self.output = os.path.join(self.directory.name, 'output')
+        os.makedirs(os.path.join(self.input, 'a'))
+        self.now = 0.0
+        self.report = StringIO()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, html):
+        path = os.path.join(self.input, name)
+        with open(path, 'w', encoding='utf_8') as f:
+            f.write(html)
+        # Give every write a distinct modification time.
+        self.now += 1
+        os.utime(path, ns=(int(self.now * 1e9), int(self.now * 1e9)))
+        return path
+
+    def read(self, directory, name):
+        with open(os.path.join(directory, name), encoding='utf_8') as f:
+            return f.read()
+
+    def watcher(self, output_dir):
+        return watch.Watcher([self.input], output_dir, ['cs', 'en'], debounce=1, file=self.report,
+                             clock=lambda: self.now)
+
+    def test_watch(self):
+        self.write('index.html', 'k mostu')
+        self.write(os.path.join('a', 'b.html'), 'v lese')
+        watcher = self.watcher(self.output)
+        self.assertEqual(watcher.step(), 0)
+        self.now += 0.5
+        self.assertEqual(watcher.step(), 0)
+        self.now += 0.5
+        self.assertEqual(watcher.step(), 2)
+        self.assertEqual(self.read(self.output, 'index.html'), 'k&nbsp;mostu')
+        self.assertEqual(watcher.step(), 0)
+        # A burst of writes is transduced once, after the last one.
+        self.write('index.html', 's bratrem')
+        self.assertEqual(watcher.step(), 0)
+        self.write('index.html', 'z lesa')
+        self.assertEqual(watcher.step(), 0)
+        self.now += 0.5
+        self.assertEqual(watcher.step(), 0)
+        self.now += 0.5
+        self.assertEqual(watcher.step(), 1)
+        self.assertEqual(self.read(self.output, 'index.html'), 'z&nbsp;lesa')
+        self.assertIn('index.html', self.report.getvalue())
+        # Touching a file does not transduce it again.
+        self.write('index.html', 'z lesa')
+        self.assertEqual(watcher.step(), 0)
+        self.now += 1
+        self.step_reports(watcher, 'unchanged')
+
+    def test_watch_in_place(self):
+        path = self.write('index.html', 'k mostu')
+        watcher = self.watcher(None)
+        watcher.step()
+        self.now += 1
+        self.assertEqual(watcher.step(), 1)
+        self.assertEqual(self.read(self.input, 'index.html'), 'k&nbsp;mostu')
+        # The output written in place does not count as a change.
+        self.now += 1
+        self.assertEqual(watcher.step(), 0)
+        os.remove(path)
+        self.assertEqual(watcher.step(), 0)
+        self.assertEqual(watcher.done, {})
+
+    def step_reports(self, watcher, text):
+        self.report.seek(0)
+        self.report.truncate()
+        watcher.step()
+        self.assertIn(text, self.report.getvalue())
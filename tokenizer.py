@@ -0,0 +1,242 @@
+"""
+Splitting of HTML documents into content and tags, and joining them back together.
+
+Everything enclosed in angle brackets is a tag, as is a stray closing angle bracket.
+A comment and an element ``pre``, ``script`` or ``style`` together with its content is a single tag,
+so that its content is never transduced.
+An element ``pre``, ``script`` or ``style`` is represented in the content by a `region_mark`, so that the text
+before the element and the text after it are not joined together.
+A tag that is not closed extends to the end of the document.
+Adjacent tags are treated as a single tag.
+"""
+
+import bisect
+import codecs
+import math
+import re
+import zlib
+
+_TAG = re.compile(r'(?:<!--.*?(?:-->|\Z)|<(pre|script|style)(?=[\s>])[^>]*>.*?(?:</\1\s*>|\Z)|<[^>]*>?|>)+',
+                  re.DOTALL | re.IGNORECASE)
+_TAG_BYTES = re.compile(_TAG.pattern.encode('ascii'), _TAG.flags & ~re.UNICODE)
+
+#: the character that stands for an element ``pre``, ``script`` or ``style`` in the content. It ends the content
+#: before the tag that holds the element and is dropped by `splice`.
+region_mark = '\ufffc'
+
+
+def is_ascii_compatible(encoding):
+    """
+    Tells whether the bytes of an encoded HTML document can be tokenized without decoding them.
+    This holds for UTF-8 and for the single-byte encodings that extend ASCII, where the bytes of ASCII characters never
+    occur inside another character.
+
+    :param encoding: the name of an encoding
+    """
+    if codecs.lookup(encoding).name == 'utf-8':
+        return True
+    try:
+        return (bytes(range(128)).decode(encoding) == ''.join(map(chr, range(128))) and
+                len(bytes(range(256)).decode(encoding, 'replace')) == 256)
+    except (UnicodeError, LookupError):
+        return False
+
+
+def tokenize(html, encoding=None):
+    """
+    Splits a HTML document into its content and tags.
+
+    :param html: a HTML formatted string, or a bytes-like object such as a `mmap.mmap` if `encoding` is set
+    :param encoding: the encoding of `html` if it is bytes-like. The encoding must be ASCII compatible
+        (see `is_ascii_compatible`). Only the content is decoded.
+    :return: a pair of the content string and the list of tags. Every tag is a triple `(index, start, end)` where
+        `index` is the position in the content the tag precedes and `(start, end)` is the span of the tag in `html`.
+        If the tag holds an element ``pre``, ``script`` or ``style``, the character before `index` is
+        a `region_mark`.
+    """
+    if encoding is None:
+        regex = _TAG
+    else:
+        assert is_ascii_compatible(encoding)
+        regex = _TAG_BYTES
+    tags = []
+    content = []
+    pos = 0
+    length = 0
+    for match in regex.finditer(html):
+        start, end = match.span()
+        text = html[pos:start]
+        if encoding is not None:
+            text = str(text, encoding)
+        content.append(text)
+        length += len(text)
+        if match.group(1) is not None:
+            content.append(region_mark)
+            length += 1
+        tags.append((length, start, end))
+        pos = end
+    if not tags and encoding is None:
+        return html, tags
+    text = html[pos:]
+    if encoding is not None:
+        text = str(text, encoding)
+    content.append(text)
+    return ''.join(content), tags
+
+
+def locate(tags, index):
+    """
+    Finds a character of the content in the HTML document.
+
+    :param tags: the list of tags as returned by `tokenize`
+    :param index: the position of the character in the content
+    :return: the position of the character in the HTML document
+    """
+    # The number of tags that precede the character
+    i = bisect.bisect_right(tags, (index, math.inf))
+    if i == 0:
+        return index
+    tag_index, _start, end = tags[i - 1]
+    return end + index - tag_index
+
+
+def splice(html, tags, content, indices, encoding=None):
+    """
+    Inserts the tags of a HTML document into its transduced content.
+
+    :param html: the HTML formatted string or the bytes-like object the tags were taken from
+    :param tags: the list of tags as returned by `tokenize`
+    :param content: the transduced content
+    :param indices: the `IndexMap` of the transduced content
+    :param encoding: the encoding of `html` if it is bytes-like
+    :return: a generator of the slices of the resulting HTML string
+    """
+    pos = 0
+    for position, (_index, start, end) in zip(indices.positions(tag[0] for tag in tags), tags):
+        stop = before(html, start, end, content, position)
+        if stop > pos:
+            yield content[pos:stop]
+        if encoding is None:
+            yield html[start:end]
+        else:
+            yield str(html[start:end], encoding)
+        pos = position
+    if pos < len(content):
+        yield content[pos:]
+
+
+def before(html, start, end, content, position):
+    """
+    Finds the end of the content that precedes a tag, without the `region_mark` of the tag.
+
+    :param html: the HTML formatted string or the bytes-like object the tag was taken from
+    :param start: the start of the tag in `html`
+    :param end: the end of the tag in `html`
+    :param content: the transduced content
+    :param position: the position of the tag in the transduced content
+    :return: `position`, or the position of the `region_mark` of the tag
+    """
+    if position == 0 or content[position - 1] != region_mark:
+        return position
+    regex = _TAG if isinstance(html, str) else _TAG_BYTES
+    if regex.match(html, start, end).group(1) is None:
+        return position
+    return position - 1
+
+
+def cut(html, separator='\n'):
+    """
+    Finds where a part of a HTML document can be split off.
+    The split is made after a separator in the content. The tags before the split must be complete, so that reading
+    more of the document cannot change them.
+
+    :param html: the beginning of a HTML document, either a string or bytes in an ASCII compatible encoding
+    :param separator: a single character, as bytes if `html` is bytes
+    :return: the position after the last such separator, or 0 if there is none
+    """
+    position = 0
+    pos = 0
+    for match in (_TAG if isinstance(html, str) else _TAG_BYTES).finditer(html):
+        start, end = match.span()
+        found = html.rfind(separator, pos, start)
+        if found >= 0:
+            position = found + 1
+        pos = end
+    # The last tag may continue in the rest of the document. In that case `pos` is the end of `html`.
+    found = html.rfind(separator, pos)
+    if found >= 0:
+        position = found + 1
+    return position
+
+
+def pieces(infile, chunk_size, separator='\n'):
+    """
+    Reads a HTML document in pieces that end with a separator in the content, as found by `cut`.
+    The document is read in chunks of a given size, so a piece is only longer than the chunk size
+    if the document has long lines. A piece holds at least a whole line, so a document whose content has no
+    newline is read as a single piece.
+
+    :param infile: a text file, or a binary file such as a `mmap.mmap` in an ASCII compatible encoding
+    :param chunk_size: the number of characters (or bytes) to read at a time
+    :param separator: a single character, as bytes if `infile` is binary
+    :return: a generator of the pieces. Their concatenation is the whole document.
+    """
+    pending = infile.read(0)
+    target = chunk_size
+    while True:
+        chunk = infile.read(chunk_size)
+        if not chunk:
+            break
+        pending += chunk
+        if len(pending) < target:
+            continue
+        position = cut(pending, separator)
+        if position == 0:
+            # Wait until the pending text doubles so that looking for a split stays linear in its length.
+            target = 2 * len(pending)
+            continue
+        yield pending[:position]
+        pending = pending[position:]
+        target = chunk_size
+    if pending:
+        yield pending
+
+
+def blocks(html, separator='\n', mask=7):
+    """
+    Splits a HTML document into blocks that end with a separator in the content.
+    A block ends after a line whose checksum has the bits of `mask` clear, so a block has `mask + 1` lines on average
+    and the same lines are split into the same blocks in every document.
+
+    :param html: a HTML formatted string
+    :param separator: a single character
+    :param mask: the mask of the checksum
+    :return: a generator of the blocks. Their concatenation is the whole document.
+    """
+    start = 0
+    line = 0
+    pos = 0
+    for match in _TAG.finditer(html):
+        found = html.find(separator, pos, match.start())
+        while found >= 0:
+            line, start = yield from _block(html, start, line, found + 1, mask)
+            found = html.find(separator, found + 1, match.start())
+        pos = match.end()
+    found = html.find(separator, pos)
+    while found >= 0:
+        line, start = yield from _block(html, start, line, found + 1, mask)
+        found = html.find(separator, found + 1)
+    if start < len(html):
+        yield html[start:]
+
+
+def _block(html, start, line, end, mask):
+    """
+    Yields the block from `start` to `end` if the line from `line` to `end` ends a block.
+
+    :return: the start of the next line and the start of the next block
+    """
+    if zlib.crc32(html[max(line, end - 64):end].encode('utf_8', 'surrogatepass')) & mask == 0:
+        yield html[start:end]
+        return end, end
+    return end, start
@@ -4,30 +4,92 @@ using the method `process_file`.
 """
 
 import gettext
-import heapq
-import itertools
+import hashlib
+import json
+import mmap
+import os
 import re
 import sys
+import time
 from abc import abstractmethod, ABCMeta
 from argparse import ArgumentParser
 from collections import OrderedDict
+from contextlib import suppress
 from enum import Enum
 from itertools import chain
-from queue import PriorityQueue
 
 from ordered_set import OrderedSet
 from overrides import overrides
 
 import config
+import reparse
+import tokenizer
+from indexmap import IndexMap
 
 _ = gettext.translation(config.domain, localedir=config.localedir, fallback=True).gettext
 
+# The value of an attribute that has not been computed yet, where `None` is a valid value
+_unknown = object()
+
+#: the character that stands for a non-breaking space in the content while it is transduced. Every replacement of
+#: a space is thus a single character, so the content and its indices stay aligned. The placeholders are expanded
+#: to the form chosen by `Transducer.nbsp` when the content is spliced back into the HTML document.
+placeholder = '\u00a0'
+
+
+class Statistics:
+    """
+    Counters of the work done by a transducer
+    """
+
+    fields = ('matches', 'sweeps', 'skips', 'scanned', 'seconds')
+
+    def __init__(self, names=()):
+        #: the names of the registered transducers whose work is counted
+        self.names = tuple(names)
+        #: the number of matches of the pattern
+        self.matches = 0
+        #: the number of sweeps over the string, including the repeated sweeps of a fixpoint
+        self.sweeps = 0
+        #: the number of strings skipped because the transducer could not match them
+        self.skips = 0
+        #: the number of characters searched
+        self.scanned = 0
+        #: the running time in seconds
+        self.seconds = 0.0
+
+    def add(self, other):
+        for field in self.fields:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+    def as_dict(self):
+        return OrderedDict((field, getattr(self, field)) for field in self.fields)
+
+    @classmethod
+    def from_dict(cls, names, values):
+        statistics = cls(names)
+        for field in cls.fields:
+            setattr(statistics, field, values[field])
+        return statistics
+
 
 class Transducer(metaclass=ABCMeta):
     """
     The abstract base class for transducers
     """
 
+    class Nbsp(Enum):
+        """
+        The forms of a non-breaking space in the output
+        """
+        entity = '&nbsp;'
+        numeric = '&#160;'
+        raw = placeholder
+
+    #: the form of the non-breaking spaces written by `slices` and `transduce_many`.
+    #: `MasterTransducer.configure` sets it for the master.
+    nbsp = Nbsp.entity
+
     def __init__(self, name=None, description=None, examples=None):
         self.name = name
         self.description = description
@@ -54,67 +116,318 @@ class Transducer(metaclass=ABCMeta):
                 file.write('    +{0}\n'.format(self.transduce_html(before)))
 
     @abstractmethod
-    def substitute(self, string, indices):
+    def substitute(self, string, indices, statistics=None):
         """
         Translates a string.
 
         :param string: the string to be translated
-        :param indices: the indices of characters of the string
-        :return: a pair of string and indices
+        :param indices: the indices of characters of the string: an `IndexMap` or a non-decreasing sequence of
+            integers such as `range(len(string))`
+        :param statistics: a `Statistics` instance to count the work in, or `None`
+        :return: a pair of string and its `IndexMap`. The map is a sequence of the indices of characters.
         """
         raise NotImplementedError()  # pragma: no cover
 
-    def transduce_html(self, html):
+    def is_separator(self, char):
+        """
+        Tells whether a character splits a string into pieces that this transducer transduces independently.
+        The answer errs on the side of `False`.
+
+        :param char: a single character
+        """
+        return False
+
+    def may_match(self, string):
+        """
+        Tells cheaply whether `substitute` can change a string.
+        The answer errs on the side of `True`.
+
+        :param string: the string to be translated
+        """
+        return True
+
+    def changes(self, string):
+        """
+        Finds the spans of a string that `substitute` would change.
+        The first span is exact and is found as early as the transducer allows, so whether the string would change at
+        all is known as soon as the first span is taken. The following spans may miss changes that depend on
+        the changes found before them.
+
+        :param string: the string to be translated
+        :return: a generator of triples `(start, end, name)` where `(start, end)` is a span of the string and `name`
+            is the name of the transducer that changes it
+        """
+        result, _indices = self.substitute(string, IndexMap.identity(len(string)))
+        if result == string:
+            return
+        start = 0
+        while start < min(len(string), len(result)) and string[start] == result[start]:
+            start += 1
+        shift = len(result) - len(string)
+        end = len(string)
+        while end > start and end + shift > start and string[end - 1] == result[end + shift - 1]:
+            end -= 1
+        yield start, end, self.name
+
+    def definition(self):
+        """
+        Describes what this transducer does, so that a change of the description implies a change of the output.
+
+        :return: a tuple of literals
+        """
+        return type(self).__name__, self.name
+
+    def transduce_html(self, html, encoding=None):
         """
         Transduces a HTML formatted string.
 
-        :param html: a HTML formatted string
+        :param html: a HTML formatted string, or a bytes-like object if `encoding` is set
+        :param encoding: the encoding of `html` if it is bytes-like, see `tokenizer.tokenize`
         :return: the HTML string with the content transduced by this transducer
         """
-        # Load html
-        inside_tag = False
-        content_list = []
-        tags = OrderedDict()
+        return ''.join(self.slices(html, encoding))
+
+    def write_html(self, html, outfile, encoding=None):
+        """
+        Transduces a HTML formatted string, writing to an output file.
+        The slices of the result are written one by one, so the resulting string is never held in memory as a whole.
+
+        :param html: a HTML formatted string, or a bytes-like object if `encoding` is set
+        :param outfile: output HTML file
+        :param encoding: the encoding of `html` if it is bytes-like, see `tokenizer.tokenize`
+        """
+        outfile.writelines(self.slices(html, encoding))
+
+    def slices(self, html, encoding=None):
+        """
+        Transduces a HTML formatted string.
+
+        :param html: a HTML formatted string, or a bytes-like object if `encoding` is set
+        :param encoding: the encoding of `html` if it is bytes-like, see `tokenizer.tokenize`
+        :return: a generator of the slices of the resulting HTML string, see `tokenizer.splice`
+        """
+        content, tags = tokenizer.tokenize(html, encoding)
+        content_transduced, indices = self.substitute_content(content)
+        content_transduced, indices = self.expand(content, content_transduced, indices)
+        return tokenizer.splice(html, tags, content_transduced, indices, encoding)
+
+    def substitute_content(self, content):
+        """
+        Translates the content of a HTML document as returned by `tokenizer.tokenize`.
+        No match spans a `tokenizer.region_mark`: unless the mark is a separator for this transducer
+        (see `is_separator`), the pieces of the content between the marks are translated one by one.
+
+        :param content: the content
+        :return: a pair of the translated content and its `IndexMap`
+        """
+        spans = self._content_spans(content)
+        if spans is None:
+            return self.substitute(content, IndexMap.identity(len(content)))
+        strings = []
+        maps = []
+        for start, end in spans:
+            piece = content[start:end]
+            if piece == tokenizer.region_mark:
+                strings.append(piece)
+                maps.append(IndexMap.identity(1))
+            else:
+                piece, indices = self.substitute(piece, IndexMap.identity(len(piece)))
+                strings.append(piece)
+                maps.append(indices)
+        return ''.join(strings), IndexMap.concatenate(maps, [start for start, _end in spans])
+
+    def _content_spans(self, content):
+        """
+        :return: `None` if the content can be translated at once, otherwise a list of the `(start, end)` spans of
+            the pieces between the `tokenizer.region_mark` characters and of the marks themselves
+        """
+        mark = tokenizer.region_mark
+        if mark not in content or self.is_separator(mark):
+            return None
+        spans = []
+        start = 0
+        end = content.find(mark)
+        while end >= 0:
+            spans.append((start, end))
+            spans.append((end, end + 1))
+            start = end + 1
+            end = content.find(mark, start)
+        spans.append((start, len(content)))
+        return spans
+
+    def expand(self, content, transduced, indices):
+        """
+        Expands the placeholders inserted by `substitute` to the form chosen by `nbsp`.
+        A non-breaking space that maps to a non-breaking space of the content is kept as it is.
+
+        :param content: the content before `substitute`
+        :param transduced: the content returned by `substitute`
+        :param indices: the `IndexMap` returned by `substitute`
+        :return: a pair of the expanded content and its `IndexMap`
+        """
+        form = self.nbsp.value
+        if form == placeholder or placeholder not in transduced:
+            return transduced, indices
+        positions = []
+        find = transduced.find
+        p = find(placeholder)
+        while p >= 0:
+            positions.append(p)
+            p = find(placeholder, p + 1)
+        if placeholder in content:
+            positions = [p for p in positions if content[indices[p]] != placeholder]
+            if not positions:
+                return transduced, indices
+        result = []
         i = 0
-        tag = []
-        for c in html:
-            assert isinstance(c, str)
-            assert len(c) == 1
-            if c == r'<':
-                inside_tag = True
-                tag.append(c)
-                continue
-            if c == r'>':
-                inside_tag = False
-                tag.append(c)
-                continue
-            if inside_tag:
-                tag.append(c)
-                continue
-            if tag:
-                tags[i] = ''.join(tag)
-                tag = []
-            content_list.append(c)
-            i += 1
-        if tag:
-            tags[i] = ''.join(tag)
-        content = ''.join(content_list)
-        # Transduce
-        content_transduced, indices = self.substitute(content, range(len(content)))
-        transduced = zip(indices, content_transduced)
-        # Insert tags
-        # The `key` argument requires Python 3.5
-        merged = heapq.merge(tags.items(), transduced, key=lambda x: x[0])
-        return ''.join((string for i, string in merged))
-
-    def process_file(self, infile, outfile):
+        for p in positions:
+            result.append(transduced[i:p])
+            result.append(form)
+            i = p + 1
+        result.append(transduced[i:])
+        return ''.join(result), indices.replace([(p, p + 1, len(form), p) for p in positions])
+
+    def transduce_many(self, snippets, batch_size=1000, separator='\n'):
+        """
+        Transduces many HTML formatted strings, such as the short fields of a database.
+
+        If `separator` is a separator for this transducer (see `is_separator`), the contents of up to `batch_size`
+        strings are joined by it and transduced at once, so that the overhead of a call of `substitute` is shared by
+        the batch. Otherwise the strings are transduced one by one. The results are the same in either case.
+
+        :param snippets: an iterable of HTML formatted strings
+        :param batch_size: the maximum number of strings transduced at once
+        :param separator: a single character
+        :return: a generator of the transduced strings in the order of `snippets`
+        """
+        assert batch_size > 0
+        if not self.is_separator(separator):
+            for snippet in snippets:
+                yield self.transduce_html(snippet)
+            return
+        batch = []
+        for snippet in snippets:
+            batch.append(snippet)
+            if len(batch) == batch_size:
+                yield from self._transduce_batch(batch, separator)
+                batch = []
+        if batch:
+            yield from self._transduce_batch(batch, separator)
+
+    def _transduce_batch(self, snippets, separator):
+        tokenized = [tokenizer.tokenize(snippet) for snippet in snippets]
+        content = separator.join(snippet_content for snippet_content, _tags in tokenized)
+        transduced, indices = self.substitute_content(content)
+        transduced, indices = self.expand(content, transduced, indices)
+        # The start, the tags and the end of every snippet as indices of `content`
+        marks = []
+        offset = 0
+        for snippet_content, tags in tokenized:
+            marks.append(offset)
+            marks.extend(offset + index for index, _start, _end in tags)
+            offset += len(snippet_content)
+            marks.append(offset)
+            offset += 1
+        positions = indices.positions(marks)
+        for snippet, (_snippet_content, tags) in zip(snippets, tokenized):
+            pos = next(positions)
+            result = []
+            for _index, start, end in tags:
+                position = next(positions)
+                result.append(transduced[pos:tokenizer.before(snippet, start, end, transduced, position)])
+                result.append(snippet[start:end])
+                pos = position
+            result.append(transduced[pos:next(positions)])
+            yield ''.join(result)
+
+    def process_file(self, infile, outfile, chunk_size=None):
         """
         Transduces an input HTML file, writing to an output file.
 
+        If `chunk_size` is set and a newline is a separator for this transducer (see `is_separator`), the file is
+        streamed: it is read in chunks and transduced in pieces that end with a newline, so the memory use does not
+        grow with the size of the file. The output is the same as without streaming.
+        Otherwise the whole file is read at once.
+
         :param infile: input HTML file
         :param outfile: output HTML file
+        :param chunk_size: the number of characters to read at a time, or `None` to read the whole file
+        """
+        if chunk_size is None or not self.is_separator('\n'):
+            self.write_html(infile.read(), outfile)
+            return
+        for piece in tokenizer.pieces(infile, chunk_size):
+            self.write_html(piece, outfile)
+
+    def process_mapped(self, path, outfile, encoding='utf_8', chunk_size=None):
+        """
+        Transduces an input HTML file mapped into memory, writing to an output file.
+        The file is tokenized in place and only its content is decoded, so the whole document is never held
+        as a string. With `chunk_size`, the mapped file is transduced in pieces as in `process_file`.
+        Files in encodings that are not ASCII compatible (see `tokenizer.is_ascii_compatible`) and empty files
+        are read by `process_file`.
+
+        :param path: the path of the input HTML file
+        :param outfile: output HTML file
+        :param encoding: the encoding of the input file
+        :param chunk_size: the number of bytes to read at a time, or `None` to transduce the whole file at once
+        """
+        with open(path, 'rb') as infile:
+            if not tokenizer.is_ascii_compatible(encoding) or os.fstat(infile.fileno()).st_size == 0:
+                with open(path, encoding=encoding) as text_file:
+                    self.process_file(text_file, outfile, chunk_size)
+                return
+            with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if chunk_size is None or not self.is_separator('\n'):
+                    pieces = [mapped]
+                else:
+                    pieces = tokenizer.pieces(mapped, chunk_size, b'\n')
+                for piece in pieces:
+                    self.write_html(piece, outfile, encoding)
+
+    def check_html(self, html):
         """
-        outfile.write(self.transduce_html(infile.read()))
+        Finds the spans of a HTML formatted string that `transduce_html` would change, see `changes`.
+
+        :param html: a HTML formatted string
+        :return: a generator of triples `(start, end, name)` where `(start, end)` is a span of `html`
+        """
+        content, tags = tokenizer.tokenize(html)
+        spans = self._content_spans(content)
+        if spans is None:
+            changes = self.changes(content)
+        else:
+            changes = ((offset + start, offset + end, name) for offset, stop in spans
+                       if content[offset:stop] != tokenizer.region_mark
+                       for start, end, name in self.changes(content[offset:stop]))
+        for start, end, name in changes:
+            html_start = tokenizer.locate(tags, start)
+            yield html_start, html_start if start == end else tokenizer.locate(tags, end - 1) + 1, name
+
+    def check_file(self, infile, chunk_size=None):
+        """
+        Finds the changes that `process_file` would make to an input HTML file, without writing any output.
+        The file is read as by `process_file`. The changes are found lazily, so a caller that stops at the first
+        change does not search the rest of the file, nor read the rest of a streamed file.
+
+        :param infile: input HTML file
+        :param chunk_size: the number of characters to read at a time, or `None` to read the whole file
+        :return: a generator of quadruples `(line, column, text, name)` that locate the start of every change and
+            give the text of the file it would change, see `changes`. The lines and columns are counted from 1.
+        """
+        if chunk_size is None or not self.is_separator('\n'):
+            pieces = [infile.read()]
+        else:
+            pieces = tokenizer.pieces(infile, chunk_size)
+        line = 1
+        for piece in pieces:
+            for start, end, name in self.check_html(piece):
+                yield line + piece.count('\n', 0, start), start - piece.rfind('\n', 0, start), piece[start:end], name
+            line += piece.count('\n')
+
+
+#: the forms of a non-breaking space, see `Transducer.Nbsp`
+nbsp_forms = frozenset(form.value for form in Transducer.Nbsp)
 
 
 class ReTransducer(Transducer):
@@ -126,14 +439,89 @@ class ReTransducer(Transducer):
         left = 'left'
         right = 'right'
 
+    class Backend(Enum):
+        """
+        The ways to find the matches of the first sweep
+        """
+        #: `literal` if the `required` strings occur rarely in the string, `regex` otherwise
+        auto = 'auto'
+        #: search the whole string
+        regex = 'regex'
+        #: search only the windows around the occurrences of the `required` strings
+        literal = 'literal'
+
+    search_gap = 4096
+
+    #: the backend of this transducer, set by the `MasterTransducer` that it is registered in, see
+    #: `MasterTransducer.backend`
+    backend = Backend.auto
+
+    #: the smallest gap between two windows around occurrences of the `required` strings that are not merged
+    literal_gap = 64
+
+    #: `Backend.auto` chooses `Backend.literal` if the `required` strings occur less than once in this number of
+    #: characters. Finding an occurrence costs about as much as searching this many characters with the pattern.
+    literal_density = 200
+
     def __init__(self, pattern, replacement, align=Align.left, fixpoint=True, name=None, description=None,
-                 examples=None):
+                 examples=None, required=None):
+        """
+        :param replacement: a dictionary that maps the numbers of the groups of the pattern to their replacements.
+            A non-breaking space in any of the forms of `Transducer.Nbsp` is replaced by the `placeholder`.
+        :param required: a collection of strings one of which occurs in every match of the pattern,
+            or `None` to find them by `reparse.required`
+        """
         super().__init__(name=name, description=description, examples=examples)
         self.pattern = pattern
         assert isinstance(replacement, dict)
-        self.replacement = replacement
+        self.replacement = {group: placeholder if value in nbsp_forms else value
+                            for group, value in replacement.items()}
         self.align = align
-        self.fixpoint = fixpoint
+        self._fixpoint = fixpoint
+        self._regex = None
+        self._reach = _unknown
+        self._required = None if required is None else tuple(required)
+        self._separators = {}
+
+    @property
+    def fixpoint(self):
+        """
+        Whether the sweep is repeated until no replacement changes the string
+        """
+        return self._fixpoint
+
+    @fixpoint.setter
+    def fixpoint(self, fixpoint):
+        self._fixpoint = fixpoint
+
+    @property
+    def regex(self):
+        """
+        The compiled pattern.
+        The pattern is compiled when it is first used, so registering a transducer that is not selected costs
+        almost nothing.
+        """
+        if self._regex is None:
+            self._regex = re.compile(self.pattern)
+        return self._regex
+
+    @property
+    def reach(self):
+        """
+        The bound computed by `reparse.reach` for the pattern
+        """
+        if self._reach is _unknown:
+            self._reach = reparse.reach(self.regex)
+        return self._reach
+
+    @property
+    def required(self):
+        """
+        A tuple of strings one of which occurs in every match of the pattern, or an empty tuple if there are none
+        """
+        if self._required is None:
+            self._required = tuple(sorted(reparse.required(self.regex) or ()))
+        return self._required
 
     @overrides
     def print_help(self, file=sys.stdout):
@@ -144,60 +532,300 @@ class ReTransducer(Transducer):
         file.write(_('  Fixpoint: {0}\n').format(self.fixpoint))
 
     @overrides
-    def substitute(self, string, indices):
-        result_string, indices = self.substitute_once(string, indices)
-        if self.fixpoint:
-            while result_string != string:
-                string = result_string
-                result_string, indices = self.substitute_once(string, indices)
-        return result_string, indices
+    def is_separator(self, char):
+        separator = self._separators.get(char)
+        if separator is None:
+            separator = self._separators[char] = reparse.separates(self.regex, char)
+        return separator
+
+    def analysis(self):
+        """
+        Analyzes the pattern, see `reach`, `required` and `is_separator`.
+
+        :return: a dictionary of the results that can be saved as JSON and passed to `restore`
+        """
+        self.is_separator('\n')
+        return {'reach': self.reach, 'required': list(self.required), 'separators': dict(self._separators)}
+
+    def restore(self, analysis):
+        """
+        Takes the results of an earlier analysis of the same pattern instead of repeating it.
+
+        :param analysis: a dictionary returned by `analysis`
+        """
+        self._reach = analysis['reach']
+        self._required = tuple(analysis['required'])
+        self._separators.update(analysis['separators'])
+
+    @overrides
+    def may_match(self, string):
+        required = self.required
+        return not required or any(literal in string for literal in required)
+
+    @overrides
+    def definition(self):
+        return (type(self).__name__, self.pattern, sorted(self.replacement.items()), self.align.value,
+                self.fixpoint)
+
+    @overrides
+    def substitute(self, string, indices, statistics=None):
+        """
+        Replaces all the matches of the pattern in a single sweep, which searches the `literal_windows`.
+        If `fixpoint` is set, the sweep is repeated until no replacement changes the string.
+        Every repeated sweep only searches the windows around the changes made by the previous sweep
+        because a new match must start less than `reach` characters away from a change.
+        """
+        string, indices, edits = self.sweep(string, indices, self.literal_windows(string), statistics)
+        while self.fixpoint and edits:
+            windows = None if self.reach is None else self.windows(_edited_spans(edits), len(string))
+            string, indices, edits = self.sweep(string, indices, windows, statistics)
+        return string, indices
+
+    @overrides
+    def changes(self, string):
+        """
+        Finds the replacements of the first sweep that change the string.
+        """
+        for match in self.matches(string, self.literal_windows(string)):
+            for (start, end), value in sorted((match.span(key), value) for key, value in self.replacement.items()):
+                if not _keeps(string[start:end], value):
+                    yield start, end, self.name
 
     def substitute_once(self, string, indices):
+        """
+        Replaces all the non-overlapping matches of the pattern in a single sweep.
+        """
+        string, indices, _edits = self.sweep(string, indices, self.literal_windows(string))
+        return string, indices
+
+    def literal_windows(self, string):
+        """
+        Chooses the windows of the first sweep according to `backend`.
+        The `literal` backend finds the occurrences of the `required` strings, which is much faster than searching
+        with the pattern, and searches with the pattern only around them.
+        It needs both the `required` strings and `reach`, otherwise the whole string is searched.
+
+        :param string: the string to be searched
+        :return: a list of windows accepted by `sweep`, or `None` to search the whole string
+        """
+        required = self.required
+        if self.backend is self.Backend.regex or not required or self.reach is None:
+            return None
+        n = len(string)
+        if (self.backend is self.Backend.auto and
+                sum(string.count(literal) for literal in required) * self.literal_density > n):
+            return None
+        regions = []
+        for literal in required:
+            find = string.find
+            i = find(literal)
+            while i >= 0:
+                regions.append((i, i + len(literal)))
+                i = find(literal, i + 1)
+        regions.sort()
+        return self.windows(regions, n, self.literal_gap)
+
+    def sweep(self, string, indices, windows=None, statistics=None):
+        """
+        Replaces all the non-overlapping matches of the pattern that start in the given windows.
+
+        :param string: the string to be translated
+        :param indices: the `IndexMap` of the string or a sequence accepted by `IndexMap.of`
+        :param windows: a sorted list of disjoint `(lo, hi)` spans as returned by `windows`,
+            or `None` to search the whole string
+        :param statistics: a `Statistics` instance to count the sweep in, or `None`
+        :return: a triple of the translated string, its `IndexMap` and a list of the edits that changed the string.
+            Every edit is a triple `(start, end, length)` that denotes that the span `(start, end)` of the input string
+            was replaced by a string of the given length.
+        """
         assert isinstance(string, str)
-        indices = list(indices)
+        indices = IndexMap.of(indices)
         assert len(string) == len(indices)
         n = len(string)
         i = 0
+        matched = 0
+        edits = []
+        replacements = []
         result_string = []
-        result_indices = []
-        match = re.search(self.pattern, string)
-        if match:
-            q = PriorityQueue()
-            for key, value in self.replacement.items():
-                span = match.span(key)
-                assert span
-                q.put((span, value))
-            while not q.empty():
-                (start, end), value = q.get()
+        for match in self.matches(string, windows):
+            matched += 1
+            for (start, end), value in sorted((match.span(key), value) for key, value in self.replacement.items()):
                 assert start >= i
-                assert start < len(string)
-                # TODO: Allow align to be set in value
-                align = self.align
+                assert start < n
+                if _keeps(string[start:end], value):
+                    continue
+                edits.append((start, end, len(value)))
                 result_string.append(string[i:start])
-                result_indices.append(indices[i:start])
-                i = start
-                if align == self.Align.left:
-                    pretend = indices[start]
-                else:
-                    pretend = indices[end - 1]
                 result_string.append(value)
-                result_indices.append([pretend] * len(value))
+                # A single character replaced by a single character, such as a space replaced by the `placeholder`,
+                # keeps its index.
+                if end - start != 1 or len(value) != 1:
+                    # TODO: Allow align to be set in value
+                    if self.align == self.Align.left:
+                        pretend = start
+                    else:
+                        pretend = end - 1
+                    replacements.append((start, end, len(value), pretend))
                 i = end
+        if statistics is not None:
+            statistics.sweeps += 1
+            statistics.matches += matched
+            if windows is None:
+                statistics.scanned += n
+            else:
+                statistics.scanned += sum(min(n, hi + self.reach) - lo for lo, hi in windows)
+        if not edits:
+            return string, indices, edits
         result_string.append(string[i:n])
-        result_indices.append(indices[i:n])
-        return ''.join(result_string), itertools.chain.from_iterable(result_indices)
+        if replacements:
+            indices = indices.replace(replacements)
+        return ''.join(result_string), indices, edits
+
+    def matches(self, string, windows=None):
+        """
+        Finds the non-overlapping matches of the pattern that start in the given windows.
+
+        :param string: the string to be searched
+        :param windows: a sorted list of disjoint `(lo, hi)` spans as returned by `windows`,
+            or `None` to search the whole string
+        :return: a generator of the matches
+        """
+        if windows is None:
+            yield from self.regex.finditer(string)
+            return
+        n = len(string)
+        pos = 0
+        for lo, hi in windows:
+            # A match that starts before `hi` does not inspect any character beyond `hi + reach`,
+            # so the search can safely stop there.
+            for match in self.regex.finditer(string, max(lo, pos), min(n, hi + self.reach)):
+                if match.start() >= hi:
+                    break
+                yield match
+                pos = match.end()
+
+    def windows(self, regions, n, gap=None):
+        """
+        Computes the spans of a string where a match that inspects a character of the given regions can start.
+        Windows separated by less than `gap` characters are merged
+        because one longer search is cheaper than many short ones.
+
+        :param regions: a sorted list of `(start, end)` spans of the string
+        :param n: the length of the string
+        :param gap: the smallest gap between two windows that are not merged, or `None` for `search_gap`
+        :return: a sorted list of disjoint `(lo, hi)` spans
+        """
+        reach = self.reach
+        assert reach is not None
+        gap = max(reach, self.search_gap if gap is None else gap)
+        result = []
+        for start, end in regions:
+            lo, hi = max(0, start - reach), min(n, end + reach)
+            if result and lo < result[-1][1] + gap:
+                result[-1] = (result[-1][0], hi)
+            else:
+                result.append((lo, hi))
+        return result
+
+
+def _keeps(matched, value):
+    """
+    Tells whether replacing a matched string with a value leaves the output as it is.
+    This holds if the matched string is the value, or if it is a non-breaking space in any form and the value is
+    the `placeholder`.
+    """
+    return matched == value or (value == placeholder and matched in nbsp_forms)
+
+
+def _edited_spans(edits):
+    """
+    Computes the spans of an edited string that have been changed by a list of edits.
+
+    :param edits: a sorted list of `(start, end, length)` edits as returned by `ReTransducer.sweep`
+    :return: a sorted list of `(start, end)` spans of the edited string
+    """
+    result = []
+    shift = 0
+    for start, end, length in edits:
+        result.append((start + shift, start + shift + length))
+        shift += length - (end - start)
+    return result
 
 
 class WordsNbspSubstituter(ReTransducer):
     """
     Replaces spaces that separate a given sequence of words.
+
+    A `fusable` pair of words is compiled into a pattern that consumes the first word and the space and only looks
+    ahead for the second word, so a single sweep replaces every space of a chain such as ``1 000 000``.
+    Other sequences are matched as a whole and swept until no replacement changes the string.
+    The pattern is chosen when it is first used.
     """
 
     def __init__(self, words, name=None, description=None, examples=None):
         words = list(words)
-        pattern = '( )'.join(words)
-        replacement = {i: r'&nbsp;' for i in range(1, len(words))}
-        super().__init__(pattern, replacement, name=name, description=description, examples=examples)
+        self.words = words
+        self._fusable = None
+        replacement = {i: placeholder for i in range(1, len(words))}
+        super().__init__(None, replacement, name=name, description=description, examples=examples)
+
+    @property
+    def pattern(self):
+        if self._pattern is None:
+            if self.fusable():
+                self._pattern = r'{0}( )'.format(_lookahead_pair(self.words))
+            else:
+                self._pattern = '( )'.join(self.words)
+        return self._pattern
+
+    @pattern.setter
+    def pattern(self, pattern):
+        self._pattern = pattern
+
+    @property
+    def fixpoint(self):
+        """
+        Whether the sweep is repeated. A single sweep suffices for the `fusable` pairs of words.
+        The value follows from the words, so it cannot be set.
+        """
+        return not self.fusable()
+
+    def fusable(self):
+        """
+        Tells whether this substituter can be merged into a `FusedNbspSubstituter`.
+
+        This holds for a pair of words that do not use groups and can match neither a space nor the `placeholder`,
+        and that inspect a bounded number of characters. Whether such a space is replaced depends only
+        on the characters that no `FusedNbspSubstituter` replacement can change, so replacing it never enables or
+        disables another match.
+        """
+        if self._fusable is None:
+            self._fusable = len(self.words) == 2 and all(map(self._fusable_word, self.words))
+        return self._fusable
+
+    @overrides
+    def analysis(self):
+        analysis = super().analysis()
+        analysis['fusable'] = self.fusable()
+        return analysis
+
+    @overrides
+    def restore(self, analysis):
+        self._fusable = analysis['fusable']
+        super().restore(analysis)
+
+    @staticmethod
+    def _fusable_word(word):
+        regex = re.compile(word)
+        return (not regex.groups and reparse.is_embeddable(regex) and
+                not reparse.can_match(regex, ' ' + placeholder) and reparse.reach(regex) is not None)
+
+
+def _lookahead_pair(words):
+    """
+    :return: a pattern that matches the first word if it is followed by a space and the second word
+    """
+    return r'(?:{0})(?= (?:{1}))'.format(*words)
 
 
 class DottedNbspSubstituter(WordsNbspSubstituter):
@@ -215,6 +843,24 @@ class DottedNbspSubstituter(WordsNbspSubstituter):
         super().__init__(words_dotted, name=name, description=description, examples=examples)
 
 
+class FusedNbspSubstituter(ReTransducer):
+    """
+    Replaces the spaces replaced by a sequence of fusable `WordsNbspSubstituter` instances in a single sweep.
+
+    The pattern is an alternation of the words before the space, each followed by a lookahead for the word after
+    the space. Since the words cannot match a space, a match never skips a replaceable space, so a single sweep finds
+    all of them.
+    """
+
+    def __init__(self, substituters):
+        self.substituters = list(substituters)
+        assert all(substituter.fusable() for substituter in self.substituters)
+        pattern = r'(?:{0})( )'.format('|'.join(_lookahead_pair(substituter.words)
+                                                for substituter in self.substituters))
+        super().__init__(pattern, {1: placeholder}, fixpoint=False,
+                         name='+'.join(substituter.name for substituter in self.substituters))
+
+
 class TransducerGroup(Transducer):
     """
     A sequence of transducers
@@ -236,9 +882,27 @@ class TransducerGroup(Transducer):
         file.write('\n')
 
     @overrides
-    def substitute(self, string, indices):
+    def is_separator(self, char):
+        return all(transducer.is_separator(char) for transducer in self.transducers)
+
+    @overrides
+    def may_match(self, string):
+        return any(transducer.may_match(string) for transducer in self.transducers)
+
+    @overrides
+    def definition(self):
+        return (type(self).__name__, self.name) + tuple(transducer.definition() for transducer in self.transducers)
+
+    @overrides
+    def changes(self, string):
         for transducer in self.transducers:
-            string, indices = transducer.substitute(string, indices)
+            yield from transducer.changes(string)
+
+    @overrides
+    def substitute(self, string, indices, statistics=None):
+        indices = IndexMap.of(indices)
+        for transducer in self.transducers:
+            string, indices = transducer.substitute(string, indices, statistics)
         return string, indices
 
 
@@ -247,12 +911,48 @@ class MasterTransducer(Transducer):
     A collection of transducers. This class is intended to be used as a singleton.
     """
 
+    #: the number of fused pipelines kept by `pipeline`
+    pipelines_kept = 16
+
     def __init__(self):
         super().__init__([])
         self.transducers = OrderedDict()
         self.groups = OrderedDict()
         self.selected = OrderedSet()
+        self.fused = False
+        #: an ordered dictionary that maps the names of the transducers that have run to their `Statistics`,
+        #: or `None` if the work is not counted
+        self.statistics = None
         self.parser = None
+        #: a `cache.TransductionCache` of the transduced blocks, or `None`
+        self.cache = None
+        #: a `memory.MemoryReport` that records the memory allocated by the phases of the transduction, or `None`
+        self.memory = None
+        #: a `shards.ShardPool` that transduces long strings in parallel, or `None`
+        self.shard_pool = None
+        #: the directory of the profiles of the analyses of the patterns (see `profiles.load`) that the workers of
+        #: `batch`, `shards` and `server` load when they are configured, or `None`
+        self.profile_cache = None
+        # The pipelines of the recently selected sets of transducers, so that switching between selections does not
+        # build and compile them again
+        self._pipelines = OrderedDict()
+        self._fingerprint = None
+        self._backend = ReTransducer.Backend.auto
+
+    @property
+    def backend(self):
+        """
+        The `ReTransducer.Backend` of the registered transducers and of the transducers of the pipelines.
+        Setting it sets the backend of every such `ReTransducer`.
+        """
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend):
+        self._backend = backend
+        for transducer in chain(self.transducers.values(), chain.from_iterable(self._pipelines.values())):
+            if isinstance(transducer, ReTransducer):
+                transducer.backend = backend
 
     def add(self, transducer, groups=None):
         """
@@ -264,6 +964,8 @@ class MasterTransducer(Transducer):
         assert name is not None
         assert name not in self.transducers.keys(), 'Duplicit transducer "{0}"'.format(name)
         self.transducers[name] = transducer
+        if isinstance(transducer, ReTransducer):
+            transducer.backend = self.backend
         for group in groups:
             assert group in self.groups.values()
             group.add(transducer)
@@ -299,6 +1001,20 @@ class MasterTransducer(Transducer):
                             help=_(
                                 'Enables the transducer T. Combine with --help to show detailed information. Available transducers: {0}').format(
                                 ', '.join(transducer_names)))
+        parser.add_argument('--fused', action='store_true',
+                            help=_('Merges the transducers that replace spaces independently of each other into '
+                                   'a single pass.'))
+        backends = [backend.value for backend in ReTransducer.Backend]
+        parser.add_argument('--backend', choices=backends, default=ReTransducer.Backend.auto.value,
+                            help=_('Chooses how the matches of the patterns are found: {0} searches the whole text, '
+                                   '{1} searches only around the strings that every match contains, {2} chooses for '
+                                   'every pattern and text (default: %(default)s).').format(
+                                ReTransducer.Backend.regex.value, ReTransducer.Backend.literal.value,
+                                ReTransducer.Backend.auto.value))
+        forms = [form.name for form in Transducer.Nbsp]
+        parser.add_argument('--nbsp', choices=forms, default=Transducer.Nbsp.entity.name,
+                            help=_('Chooses how the inserted non-breaking spaces are written: {0} as &nbsp;, {1} as '
+                                   '&#160;, {2} as the character U+00A0 (default: %(default)s).').format(*forms))
 
     def configure(self, args, file=sys.stdout):
         """
@@ -330,15 +1046,252 @@ class MasterTransducer(Transducer):
         if len(self.selected) == 0:
             # If no transducer is selected explicitly, all transducers are used.
             self.selected = self.transducers.values()
+        self.fused = getattr(args, 'fused', False)
+        self.backend = ReTransducer.Backend(getattr(args, 'backend', ReTransducer.Backend.auto.value))
+        self.nbsp = Transducer.Nbsp[getattr(args, 'nbsp', Transducer.Nbsp.entity.name)]
+
+    def select(self, names, fused=False):
+        """
+        Selects transducers by their names.
+
+        :param names: an iterable of names of registered transducers
+        :param fused: the value of `fused`
+        """
+        self.selected = OrderedSet(self.transducers[name] for name in names)
+        self.fused = fused
 
     @overrides
-    def substitute(self, string, indices):
+    def substitute(self, string, indices, statistics=None):
         """
         Translates a string using the selected transducers.
+        A transducer is skipped if `Transducer.may_match` tells that it cannot change the string.
+        If `statistics` of this instance is set, the work of every transducer is counted in it.
+        If `shard_pool` is set, a long string is transduced by it.
         """
-        for transducer in self.selected:
-            string, indices = transducer.substitute(string, indices)
+        indices = IndexMap.of(indices)
+        if self.shard_pool is not None:
+            result = self.shard_pool.substitute(string, indices)
+            if result is not None:
+                return result
+        if self.statistics is None and self.memory is None:
+            for transducer in self.pipeline():
+                if transducer.may_match(string):
+                    string, indices = transducer.substitute(string, indices, statistics)
+            return string, indices
+        for transducer in self.pipeline():
+            record = None
+            if self.statistics is not None:
+                record = self.statistics.get(transducer.name)
+                if record is None:
+                    names = [t.name for t in getattr(transducer, 'substituters', [transducer])]
+                    record = self.statistics[transducer.name] = Statistics(names)
+            if not transducer.may_match(string):
+                if record is not None:
+                    record.skips += 1
+                continue
+            start = time.perf_counter()
+            with self.phase(transducer.name):
+                string, indices = transducer.substitute(string, indices, statistics if record is None else record)
+            if record is not None:
+                record.seconds += time.perf_counter() - start
+                if statistics is not None:
+                    statistics.add(record)
         return string, indices
 
+    @overrides
+    def changes(self, string):
+        for transducer in self.pipeline():
+            if transducer.may_match(string):
+                yield from transducer.changes(string)
+
+    def phase(self, name):
+        """
+        :param name: the name of a phase of the transduction
+        :return: a context manager that records the memory allocated by the phase in `memory` if it is set
+        """
+        if self.memory is None:
+            return suppress()
+        return self.memory.phase(name)
+
+    def collect_statistics(self, enabled=True):
+        """
+        Starts or stops counting the work of the selected transducers in `statistics`.
+        Counting is disabled by default and costs nothing then.
+
+        :param enabled: whether to count
+        """
+        self.statistics = OrderedDict() if enabled else None
+
+    def take_statistics(self):
+        """
+        Takes the statistics counted so far and resets the counters.
+
+        :return: a picklable dictionary that maps the name of every transducer that has run to a pair of the names
+            of the registered transducers it stands for and the dictionary of its counters
+        """
+        result = OrderedDict((name, (record.names, record.as_dict())) for name, record in self.statistics.items())
+        self.statistics.clear()
+        return result
+
+    def merge_statistics(self, taken):
+        """
+        Adds statistics taken by `take_statistics`, for example in another process.
+        """
+        for name, (names, values) in taken.items():
+            record = self.statistics.get(name)
+            if record is None:
+                record = self.statistics[name] = Statistics(names)
+            record.add(Statistics.from_dict(names, values))
+
+    def statistics_report(self):
+        """
+        Summarizes `statistics` by transducer and by group.
+        A transducer counts towards a group if it stands for a member of the group.
+
+        :return: a dictionary with the keys ``transducers`` and ``groups`` that map the names to the dictionaries
+            of the counters, and the key ``cache`` with the counters of `cache` if it is set
+        """
+        groups = OrderedDict()
+        for group in self.groups.values():
+            members = set(t.name for t in group.transducers)
+            total = None
+            for record in self.statistics.values():
+                if members.intersection(record.names):
+                    if total is None:
+                        total = Statistics()
+                    total.add(record)
+            if total is not None:
+                groups[group.name] = total.as_dict()
+        transducers = OrderedDict((name, record.as_dict()) for name, record in self.statistics.items())
+        report = OrderedDict([('transducers', transducers), ('groups', groups)])
+        if self.cache is not None:
+            report['cache'] = OrderedDict([('hits', self.cache.hits), ('misses', self.cache.misses)])
+        return report
+
+    def print_statistics(self, file=sys.stderr, format='table'):
+        """
+        Prints `statistics_report` into a file.
+
+        :param file: the file to print to
+        :param format: ``table`` or ``json``
+        """
+        report = self.statistics_report()
+        if format == 'json':
+            json.dump(report, file, indent=2)
+            file.write('\n')
+            return
+        header = _('{0:<40} {1:>10} {2:>7} {3:>7} {4:>12} {5:>10}\n')
+        row = '{0:<40} {1:>10} {2:>7} {3:>7} {4:>12} {5:>10.4f}\n'
+        for title, records in [(_('Transducer'), report['transducers']), (_('Group'), report['groups'])]:
+            file.write(header.format(title, _('Matches'), _('Sweeps'), _('Skips'), _('Scanned'), _('Time [s]')))
+            for name, values in records.items():
+                file.write(row.format(name, *values.values()))
+        if 'cache' in report:
+            file.write(_('Cache: {0} hits, {1} misses\n').format(report['cache']['hits'], report['cache']['misses']))
+
+    @overrides
+    def is_separator(self, char):
+        return all(transducer.is_separator(char) for transducer in self.pipeline())
+
+    @overrides
+    def slices(self, html, encoding=None):
+        """
+        Transduces a HTML formatted string.
+        If `cache` is set and a newline is a separator for the selected transducers, the document is split into
+        blocks by `tokenizer.blocks` and the blocks found in the cache are not transduced again.
+        The slices are the transduced blocks then.
+        """
+        if self.memory is not None:
+            return self._measured_slices(html, encoding)
+        if self.cache is None or encoding is not None or not self.is_separator('\n'):
+            return super().slices(html, encoding)
+        return self._cached_blocks(html)
+
+    def _measured_slices(self, html, encoding):
+        with self.phase('tokenize'):
+            content, tags = tokenizer.tokenize(html, encoding)
+        transduced, indices = self.substitute_content(content)
+        with self.phase('splice'):
+            transduced, indices = self.expand(content, transduced, indices)
+            yield from tokenizer.splice(html, tags, transduced, indices, encoding)
+
+    def _cached_blocks(self, html):
+        fingerprint = self.fingerprint()
+        for block in tokenizer.blocks(html):
+            key = self.cache.key(fingerprint, block)
+            transduced = self.cache.get(key)
+            if transduced is None:
+                transduced = ''.join(super().slices(block))
+                self.cache.put(key, transduced)
+            yield transduced
+
+    def fingerprint(self):
+        """
+        Identifies the configuration of the selected transducers.
+
+        :return: a hexadecimal digest of the definitions of the transducers in `pipeline` and of the form of
+            the non-breaking spaces
+        """
+        pipeline = self.pipeline()
+        key = tuple(pipeline), self.nbsp
+        if self._fingerprint is None or self._fingerprint[0] != key:
+            definitions = repr([self.nbsp.value] + [transducer.definition() for transducer in pipeline])
+            self._fingerprint = key, hashlib.sha256(definitions.encode('utf_8')).hexdigest()
+        return self._fingerprint[1]
+
+    def pipeline(self):
+        """
+        Computes the sequence of transducers that `substitute` runs.
+
+        Without `fused`, these are the selected transducers.
+        With `fused`, every run of consecutive fusable `WordsNbspSubstituter` instances is merged into
+        a `FusedNbspSubstituter`. The result is identical because every selected transducer only replaces spaces
+        with the `placeholder` (a non-breaking space is kept, see `_keeps`), which never changes whether a fusable
+        substituter matches.
+        Transducers that are not fusable, such as ``cs.csn``, still run in their place in the sequence.
+        """
+        selected = list(self.selected)
+        if not self.fused or not all(map(self._replaces_spaces, selected)):
+            return selected
+        key = tuple(selected)
+        pipeline = self._pipelines.get(key)
+        if pipeline is not None:
+            self._pipelines.move_to_end(key)
+            return pipeline
+        pipeline = []
+        run = []
+        for transducer in selected + [None]:
+            if isinstance(transducer, WordsNbspSubstituter) and transducer.fusable():
+                run.append(transducer)
+                continue
+            if len(run) > 1:
+                substituter = FusedNbspSubstituter(run)
+                substituter.backend = self.backend
+                pipeline.append(substituter)
+            else:
+                pipeline.extend(run)
+            run = []
+            if transducer is not None:
+                pipeline.append(transducer)
+        self._pipelines[key] = pipeline
+        if len(self._pipelines) > self.pipelines_kept:
+            self._pipelines.popitem(last=False)
+        return pipeline
+
+    @staticmethod
+    def _replaces_spaces(transducer):
+        """
+        Tells whether a transducer only replaces spaces or non-breaking spaces with the `placeholder`.
+        """
+        if isinstance(transducer, WordsNbspSubstituter):
+            return True
+        if not isinstance(transducer, ReTransducer):
+            return False
+        for group, value in transducer.replacement.items():
+            language = reparse.group_language(transducer.regex, group)
+            if value != placeholder or language is None or not language <= nbsp_forms | {' '}:
+                return False
+        return True
+
 
 master = MasterTransducer()
@@ -0,0 +1,138 @@
+"""
+Transduction of the HTML files that change, by a process that keeps the transducers in memory.
+
+The files are polled, since the standard library offers no portable way to be notified of changes.
+"""
+
+import gettext
+import os
+import sys
+import time
+
+import batch
+import config
+import transducer
+
+_ = gettext.translation(config.domain, localedir=config.localedir, fallback=True).gettext
+
+
+class Watcher:
+    """
+    Watches files and directories and transduces every file some time after it has stopped changing.
+
+    A file counts as changed when its modification time or size changes. It is transduced once these have stayed
+    the same for `debounce` seconds, so a burst of writes is transduced once. The file is skipped if its content is
+    the same as when it was transduced last, see `batch.process`.
+    """
+
+    def __init__(self, paths, output_dir=None, modules=(), encoding='utf_8', chunk_size=None, debounce=0.3,
+                 manifest=None, file=sys.stderr, clock=time.monotonic):
+        """
+        :param paths: the paths of the files and directories to watch, see `batch.collect`
+        :param output_dir: the directory to write the output files to, or `None` to overwrite the input files
+        :param modules: the names of the language modules, see `batch.stamp`
+        :param encoding: the encoding of the files
+        :param chunk_size: the chunk size for `Transducer.process_file`
+        :param debounce: the number of seconds a file must stay the same before it is transduced
+        :param manifest: a dictionary returned by `batch.load_manifest` to update, or `None` to start with an empty one
+        :param file: the file to report the transduced files and the errors to
+        :param clock: the function that returns the current time in seconds
+        """
+        self.paths = list(paths)
+        self.output_dir = output_dir
+        self.modules = list(modules)
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.debounce = debounce
+        self.manifest = {} if manifest is None else manifest
+        self.file = file
+        self.clock = clock
+        self.stamp = batch.stamp(transducer.master, self.modules)
+        # The state of every file when it was transduced last
+        self.done = {}
+        # The files that have changed, mapped to their state and the time it was first seen
+        self.pending = {}
+
+    def step(self):
+        """
+        Checks the files once and transduces the files that are due.
+
+        :return: the number of files transduced or found unchanged
+        """
+        now = self.clock()
+        processed = 0
+        seen = set()
+        for source, destination in batch.collect(self.paths, self.output_dir):
+            seen.add(source)
+            try:
+                status = os.stat(source)
+            except OSError:
+                continue
+            state = status.st_mtime_ns, status.st_size
+            if self.done.get(source) == state:
+                self.pending.pop(source, None)
+                continue
+            pending = self.pending.get(source)
+            if pending is None or pending[0] != state:
+                self.pending[source] = state, now
+                if self.debounce > 0:
+                    continue
+                pending = self.pending[source]
+            if now - pending[1] < self.debounce:
+                continue
+            del self.pending[source]
+            self.process(source, destination, state, now - pending[1])
+            processed += 1
+        for source in set(self.done) - seen:
+            del self.done[source]
+        for source in set(self.pending) - seen:
+            del self.pending[source]
+        return processed
+
+    def process(self, source, destination, state, waited):
+        """
+        Transduces a file and reports the time it took.
+
+        :param state: the modification time and size of the file
+        :param waited: the number of seconds since the change of the file was noticed
+        """
+        start = self.clock()
+        previous = self.manifest.get(source)
+        error, _statistics, entry = batch.process(None, source, destination, self.encoding, self.chunk_size,
+                                                  self.stamp, previous)
+        elapsed = self.clock() - start
+        if entry is None:
+            self.manifest.pop(source, None)
+        else:
+            self.manifest[source] = entry
+        if source == destination:
+            # Writing the output changes the state of the file.
+            try:
+                status = os.stat(source)
+                state = status.st_mtime_ns, status.st_size
+            except OSError:
+                pass
+        self.done[source] = state
+        if error is not None:
+            self.file.write(_('{0}: error: {1}\n').format(source, error))
+        elif entry is previous:
+            self.file.write(_('{0}: unchanged\n').format(source))
+        else:
+            self.file.write(_('{0}: {1:.1f} ms (changed {2:.1f} ms ago)\n').format(
+                source, 1000 * elapsed, 1000 * (waited + elapsed)))
+        self.file.flush()
+
+    def run(self, interval=0.5, save=None):
+        """
+        Checks the files every `interval` seconds until interrupted.
+
+        :param interval: the number of seconds between two checks
+        :param save: a function called with the manifest whenever some file has been transduced, or `None`
+        """
+        try:
+            while True:
+                if self.step() and save is not None:
+                    save(self.manifest)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass